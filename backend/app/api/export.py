@@ -29,11 +29,11 @@ def time_range_to_timedelta(range_str: str) -> timedelta:
 @router.get("/{stream_id}/metrics.csv")
 async def export_metrics_csv(stream_id: str, range: str = "3h"):
     """Export metrics history as CSV."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     # Get metrics history
-    metrics = stream_monitor.metrics_history.get(stream_id, [])
+    metrics = stream_monitor.streams[stream_id].metrics_history
     
     if not metrics:
         raise HTTPException(status_code=404, detail="No metrics data available")
@@ -67,7 +67,7 @@ async def export_metrics_csv(stream_id: str, range: str = "3h"):
     
     output.seek(0)
     
-    stream_name = stream_monitor.active_streams[stream_id].name
+    stream_name = stream_monitor.streams[stream_id].config.name
     filename = f"{stream_name}_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
     return StreamingResponse(
@@ -80,7 +80,7 @@ async def export_metrics_csv(stream_id: str, range: str = "3h"):
 @router.get("/{stream_id}/alerts.csv")
 async def export_alerts_csv(stream_id: str):
     """Export alerts history as CSV."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     # Get alerts from alert service
@@ -116,7 +116,7 @@ async def export_alerts_csv(stream_id: str):
     
     output.seek(0)
     
-    stream_name = stream_monitor.active_streams[stream_id].name
+    stream_name = stream_monitor.streams[stream_id].config.name
     filename = f"{stream_name}_alerts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
     return StreamingResponse(
@@ -129,10 +129,10 @@ async def export_alerts_csv(stream_id: str):
 @router.get("/{stream_id}/scte35.csv")
 async def export_scte35_csv(stream_id: str):
     """Export SCTE-35 markers as CSV."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
-    events = stream_monitor.scte35_events.get(stream_id, [])
+    events = stream_monitor.streams[stream_id].scte35_events
     
     if not events:
         raise HTTPException(status_code=404, detail="No SCTE-35 events detected")
@@ -158,7 +158,7 @@ async def export_scte35_csv(stream_id: str):
     
     output.seek(0)
     
-    stream_name = stream_monitor.active_streams[stream_id].name
+    stream_name = stream_monitor.streams[stream_id].config.name
     filename = f"{stream_name}_scte35_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
     return StreamingResponse(
@@ -171,10 +171,10 @@ async def export_scte35_csv(stream_id: str):
 @router.get("/{stream_id}/loudness.csv")
 async def export_loudness_csv(stream_id: str):
     """Export loudness history as CSV."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
-    data = stream_monitor.loudness_history.get(stream_id, [])
+    data = stream_monitor.streams[stream_id].loudness_history
     
     if not data:
         raise HTTPException(status_code=404, detail="No loudness data available")
@@ -201,7 +201,7 @@ async def export_loudness_csv(stream_id: str):
     
     output.seek(0)
     
-    stream_name = stream_monitor.active_streams[stream_id].name
+    stream_name = stream_monitor.streams[stream_id].config.name
     filename = f"{stream_name}_loudness_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
     return StreamingResponse(
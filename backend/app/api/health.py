@@ -3,6 +3,7 @@ from datetime import datetime
 from app.config import settings
 from app.models import HealthStatus
 from app.services.stream_monitor import stream_monitor
+from app.services.thumbnail_generator import thumbnail_generator
 
 router = APIRouter(tags=["health"])
 
@@ -10,7 +11,7 @@ router = APIRouter(tags=["health"])
 @router.get("/health", response_model=HealthStatus)
 async def health_check():
     """System health check endpoint."""
-    workers_active = len(stream_monitor.monitoring_tasks) > 0
+    workers_active = any(state.task for state in stream_monitor.streams.values())
     
     return HealthStatus(
         status="healthy",
@@ -18,5 +19,6 @@ async def health_check():
         workers_active=workers_active,
         log_rotation_active=True,
         storage_available=True,
-        version=settings.APP_VERSION
+        version=settings.APP_VERSION,
+        thumbnail_stats=thumbnail_generator.get_stats()
     )
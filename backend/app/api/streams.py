@@ -67,11 +67,13 @@ async def list_streams():
     """Get all monitored streams."""
     result = []
     
-    for stream_id, config in stream_monitor.active_streams.items():
+    for stream_id, state in stream_monitor.streams.items():
+        config = state.config
+        
         # Get latest metrics
         current_metrics = None
-        if stream_id in stream_monitor.stream_metrics:
-            current_metrics = stream_monitor.stream_metrics[stream_id]
+        if state.current_metrics:
+            current_metrics = state.current_metrics
         elif stream_id in metrics_db and metrics_db[stream_id]:
             current_metrics = metrics_db[stream_id][-1]
         
@@ -102,14 +104,15 @@ async def list_streams():
 @router.get("/{stream_id}", response_model=StreamDetails)
 async def get_stream(stream_id: str):
     """Get detailed information about a stream."""
-    if stream_id not in stream_monitor.active_streams:
+    state = stream_monitor.streams.get(stream_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Stream not found")
     
-    config = stream_monitor.active_streams[stream_id]
+    config = state.config
     
     current_metrics = None
-    if stream_id in stream_monitor.stream_metrics:
-        current_metrics = stream_monitor.stream_metrics[stream_id]
+    if state.current_metrics:
+        current_metrics = state.current_metrics
     elif stream_id in metrics_db and metrics_db[stream_id]:
         current_metrics = metrics_db[stream_id][-1]
     
@@ -166,7 +169,7 @@ async def create_stream(config: StreamConfig):
 @router.delete("/{stream_id}")
 async def delete_stream(stream_id: str):
     """Remove a stream from monitoring."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     await stream_monitor.remove_stream(stream_id)
@@ -190,7 +193,7 @@ async def get_metrics(
     range: TimeRange = Query(TimeRange.THREE_MIN)
 ):
     """Get segment metrics for a time range."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     if stream_id not in metrics_db:
@@ -221,7 +224,7 @@ async def get_metrics(
 @router.get("/{stream_id}/sprites")
 async def get_sprites(stream_id: str):
     """Get sprite maps for a stream."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     sprites = sprite_generator.get_all_sprites(stream_id)
@@ -235,7 +238,7 @@ async def get_segments(
     offset: int = Query(0, ge=0)
 ):
     """Get segment list with pagination."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     if stream_id not in metrics_db:
@@ -255,7 +258,7 @@ async def get_loudness(
     range: TimeRange = Query(TimeRange.THREE_MIN)
 ):
     """Get loudness data for a time range."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     # Read from logs
@@ -292,7 +295,7 @@ async def get_events(
     end_date: Optional[datetime] = None
 ):
     """Get event log for a stream."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     if not start_date:
@@ -313,7 +316,7 @@ async def get_events(
 @router.get("/{stream_id}/health")
 async def get_stream_health(stream_id: str):
     """Get detailed health status for a stream."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     health = stream_monitor.get_stream_health(stream_id)
@@ -329,7 +332,7 @@ async def get_video_metrics(
     range: TimeRange = Query(TimeRange.THREE_MIN)
 ):
     """Get video-specific metrics for a stream."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     # Get metrics history
@@ -350,9 +353,7 @@ async def get_video_metrics(
         })
     
     # Get current video metrics if available
-    current = None
-    if stream_id in stream_monitor.video_metrics:
-        current = stream_monitor.video_metrics[stream_id]
+    current = stream_monitor.streams[stream_id].video_metrics
     
     return {
         "history": video_data,
@@ -366,11 +367,11 @@ async def get_audio_metrics(
     range: TimeRange = Query(TimeRange.THREE_MIN)
 ):
     """Get audio-specific metrics for a stream."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     # Get from in-memory history (faster)
-    audio_data = stream_monitor.loudness_history.get(stream_id, [])
+    audio_data = stream_monitor.streams[stream_id].loudness_history
     
     # Apply time range filter
     now = datetime.utcnow()
@@ -400,7 +401,7 @@ async def get_audio_metrics(
     
     # Get current audio metrics if available
     current = None
-    health = stream_monitor.stream_health.get(stream_id)
+    health = stream_monitor.streams[stream_id].health
     if health and health.audio_metrics:
         current = {
             "bitrate_kbps": health.audio_metrics.bitrate_kbps,
@@ -419,7 +420,7 @@ async def get_audio_metrics(
 @router.get("/{stream_id}/thumbnail")
 async def get_latest_thumbnail(stream_id: str):
     """Get the latest thumbnail for a stream."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     # Try to get cached thumbnail
@@ -427,7 +428,7 @@ async def get_latest_thumbnail(stream_id: str):
     
     if not thumb_info:
         # Fallback to current metrics
-        current_metrics = stream_monitor.stream_metrics.get(stream_id)
+        current_metrics = stream_monitor.streams[stream_id].current_metrics
         if not current_metrics or current_metrics.sequence_number is None:
             raise HTTPException(status_code=404, detail="No thumbnail available")
         
@@ -451,7 +452,7 @@ async def get_latest_thumbnail(stream_id: str):
 @router.get("/{stream_id}/thumbnail/file")
 async def get_thumbnail_file(stream_id: str):
     """Get the thumbnail file directly with proper caching headers."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     # Get cached thumbnail path
@@ -465,7 +466,7 @@ async def get_thumbnail_file(stream_id: str):
         media_type="image/jpeg",
         headers={
             "Cache-Control": "public, max-age=30",  # Cache for 30 seconds
-            "X-Sequence": str(thumbnail_generator._cache.get(stream_id, [None, None, 0])[2])
+            "X-Sequence": str(thumbnail_generator._cache.get(stream_id, (None, None, 0, 0))[2])
         }
     )
 
@@ -476,7 +477,7 @@ async def get_stream_alerts(
     include_resolved: bool = Query(False)
 ):
     """Get alerts for a stream."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     if include_resolved:
@@ -494,7 +495,7 @@ async def get_stream_alerts(
 @router.post("/{stream_id}/alerts/{alert_id}/acknowledge")
 async def acknowledge_alert(stream_id: str, alert_id: str):
     """Acknowledge an alert."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     success = alert_service.acknowledge_alert(stream_id, alert_id)
@@ -511,7 +512,7 @@ async def get_stream_logs(
     limit: int = Query(500, le=1000)
 ):
     """Get logs for a specific stream."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
     logs = await log_service.read_stream_logs(stream_id, limit=limit)
@@ -526,11 +527,12 @@ async def get_stream_logs(
 @router.get("/{stream_id}/scte35-events")
 async def get_scte35_events(stream_id: str):
     """Get SCTE-35 ad marker events for a stream."""
-    if stream_id not in stream_monitor.active_streams:
+    if stream_id not in stream_monitor.streams:
         raise HTTPException(status_code=404, detail="Stream not found")
     
-    events = stream_monitor.scte35_events.get(stream_id, [])
-    count = stream_monitor.scte35_counts.get(stream_id, 0)
+    state = stream_monitor.streams[stream_id]
+    events = state.scte35_events
+    count = state.scte35_count
     
     return {
         "events": events,
@@ -137,9 +137,10 @@ async def test_webhook(webhook_id: str):
         raise HTTPException(status_code=404, detail="Webhook not found")
     
     # Send test event
-    await webhook_service._send_to_webhook(webhook, "test", {
+    body = webhook_service._encode_event("test", {
         "message": "This is a test webhook from HLS Monitor",
         "timestamp": datetime.utcnow().isoformat()
     })
+    await webhook_service._send_to_webhook(webhook, body)
     
     return {"status": "test_sent"}
@@ -20,6 +20,7 @@ class Settings(BaseSettings):
     LOGS_DIR: str = "./logs"
     DATA_DIR: str = "./data"
     THUMBNAILS_DIR: str = "./data/thumbnails"
+    THUMBNAILS_TMP_DIR: Optional[str] = None  # scratch dir for ffmpeg output (e.g. /dev/shm/thumbnails)
     SPRITES_DIR: str = "./data/sprites"
     SEGMENTS_DIR: str = "./data/segments"
     
@@ -40,6 +41,7 @@ class Settings(BaseSettings):
     MAX_CONCURRENT_DOWNLOADS: int = 10
     DOWNLOAD_TIMEOUT: int = 30
     SEGMENT_BUFFER_SIZE: int = 8192
+    FFMPEG_MAX_CONCURRENCY: int = 0  # concurrent ffmpeg/ffprobe processes (0 = half the CPUs, min 2)
     
     # Optional S3
     S3_ENABLED: bool = False
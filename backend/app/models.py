@@ -341,6 +341,7 @@ class HealthStatus(BaseModel):
     log_rotation_active: bool
     storage_available: bool
     version: str
+    thumbnail_stats: Dict[str, int] = Field(default_factory=dict)
 
 
 # WebSocket message models
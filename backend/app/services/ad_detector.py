@@ -1,6 +1,6 @@
 import re
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from app.models import AdMarker
 
@@ -20,41 +20,47 @@ class AdDetector:
         - Custom tags for bandwidth reservation
         """
         markers = []
-        lines = manifest_content.split('\n')
         
-        for i, line in enumerate(lines):
-            line = line.strip()
-            
-            # Ad insertion via DATERANGE
-            if line.startswith('#EXT-X-DATERANGE'):
-                marker = self._parse_daterange(line)
-                if marker:
-                    markers.append(marker)
-            
-            # Splice out (ad break start)
-            elif line.startswith('#EXT-X-CUE-OUT'):
-                marker = self._parse_cue_out(line, i, lines)
-                if marker:
-                    markers.append(marker)
-            
-            # Splice in (ad break end)
-            elif line.startswith('#EXT-X-CUE-IN'):
-                marker = self._parse_cue_in(line, i, lines)
-                if marker:
-                    markers.append(marker)
-            
-            # Bandwidth reservation (custom detection)
-            elif 'BANDWIDTH-RESERVATION' in line.upper():
-                marker = AdMarker(
-                    timestamp=datetime.utcnow(),
-                    type="bandwidth_reservation",
-                    duration=None,
-                    metadata={"line": line}
-                )
+        for line in manifest_content.split('\n'):
+            marker = self.parse_tag(line.strip())
+            if marker:
                 markers.append(marker)
         
         return markers
     
+    def parse_tag(self, line: str) -> Optional[AdMarker]:
+        """
+        Classify a single stripped manifest line.
+        
+        Lets the stream monitor detect markers during its own manifest pass
+        instead of re-scanning the whole manifest.
+        
+        Returns:
+            AdMarker if the line is an ad/splice marker, None otherwise
+        """
+        # Ad insertion via DATERANGE
+        if line.startswith('#EXT-X-DATERANGE'):
+            return self._parse_daterange(line)
+        
+        # Splice out (ad break start)
+        elif line.startswith('#EXT-X-CUE-OUT'):
+            return self._parse_cue_out(line)
+        
+        # Splice in (ad break end)
+        elif line.startswith('#EXT-X-CUE-IN'):
+            return self._parse_cue_in(line)
+        
+        # Bandwidth reservation (custom detection)
+        elif 'BANDWIDTH-RESERVATION' in line.upper():
+            return AdMarker(
+                timestamp=datetime.utcnow(),
+                type="bandwidth_reservation",
+                duration=None,
+                metadata={"line": line}
+            )
+        
+        return None
+    
     def _parse_daterange(self, line: str) -> AdMarker:
         """Parse #EXT-X-DATERANGE tag."""
         try:
@@ -101,7 +107,7 @@ class AdDetector:
             logger.error(f"Error parsing DATERANGE: {e}")
             return None
     
-    def _parse_cue_out(self, line: str, index: int, lines: List[str]) -> AdMarker:
+    def _parse_cue_out(self, line: str) -> AdMarker:
         """Parse #EXT-X-CUE-OUT tag."""
         try:
             duration = None
@@ -127,7 +133,7 @@ class AdDetector:
             logger.error(f"Error parsing CUE-OUT: {e}")
             return None
     
-    def _parse_cue_in(self, line: str, index: int, lines: List[str]) -> AdMarker:
+    def _parse_cue_in(self, line: str) -> AdMarker:
         """Parse #EXT-X-CUE-IN tag."""
         try:
             return AdMarker(
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 from enum import Enum
 from dataclasses import dataclass, field
 import asyncio
+from app.models import AlertModel
 
 logger = logging.getLogger(__name__)
 
@@ -116,6 +117,20 @@ class AlertService:
         
         # Last check timestamps per stream
         self._last_checks: Dict[str, datetime] = {}
+        
+        # Per-stream change counter, bumped whenever a stream's alerts change
+        self._versions: Dict[str, int] = {}
+        
+        # alert_id -> AlertModel, dropped whenever the alert changes
+        self._model_cache: Dict[str, AlertModel] = {}
+    
+    def _bump_version(self, stream_id: str):
+        """Mark a stream's alerts as changed."""
+        self._versions[stream_id] = self._versions.get(stream_id, 0) + 1
+    
+    def get_version(self, stream_id: str) -> int:
+        """Get the change counter for a stream's alerts."""
+        return self._versions.get(stream_id, 0)
     
     def _generate_alert_id(self) -> str:
         """Generate unique alert ID."""
@@ -147,6 +162,8 @@ class AlertService:
                 existing.timestamp = datetime.utcnow()
                 if metadata:
                     existing.metadata.update(metadata)
+                self._model_cache.pop(existing.alert_id, None)
+                self._bump_version(stream_id)
                 return None  # Deduplicated
         
         # Create new alert
@@ -161,6 +178,7 @@ class AlertService:
         
         self._active_alerts[stream_id][alert_type] = alert
         self._alert_history.append(alert)
+        self._bump_version(stream_id)
         
         logger.warning(f"Alert raised: [{severity.value}] {stream_id} - {message}")
         
@@ -190,6 +208,8 @@ class AlertService:
         if not alert.resolved:
             alert.resolved = True
             alert.resolved_at = datetime.utcnow()
+            self._model_cache.pop(alert.alert_id, None)
+            self._bump_version(stream_id)
             logger.info(f"Alert resolved: {stream_id} - {alert_type.value}")
             return True
         
@@ -203,6 +223,8 @@ class AlertService:
         for alert in self._active_alerts[stream_id].values():
             if alert.alert_id == alert_id:
                 alert.acknowledged = True
+                self._model_cache.pop(alert.alert_id, None)
+                self._bump_version(stream_id)
                 return True
         
         return False
@@ -217,6 +239,25 @@ class AlertService:
             if not alert.resolved
         ]
     
+    def get_model(self, alert: Alert) -> AlertModel:
+        """Get the API model for an alert, reusing it until the alert changes."""
+        model = self._model_cache.get(alert.alert_id)
+        if model is None:
+            model = AlertModel(
+                alert_id=alert.alert_id,
+                stream_id=alert.stream_id,
+                alert_type=alert.alert_type.value,
+                severity=alert.severity.value,
+                message=alert.message,
+                timestamp=alert.timestamp,
+                metadata=alert.metadata,
+                acknowledged=alert.acknowledged,
+                resolved=alert.resolved,
+                resolved_at=alert.resolved_at
+            )
+            self._model_cache[alert.alert_id] = model
+        return model
+    
     def get_all_active_alerts(self) -> List[Alert]:
         """Get all active alerts across all streams."""
         alerts = []
@@ -374,11 +415,15 @@ class AlertService:
     def cleanup_stream(self, stream_id: str):
         """Remove all alerts for a stream (call when stream is removed)."""
         if stream_id in self._active_alerts:
+            for alert in self._active_alerts[stream_id].values():
+                self._model_cache.pop(alert.alert_id, None)
             del self._active_alerts[stream_id]
         
         if stream_id in self._last_checks:
             del self._last_checks[stream_id]
         
+        self._bump_version(stream_id)
+        
         logger.info(f"Cleaned up alerts for stream: {stream_id}")
     
     def cleanup_old_alerts(self, max_age_hours: int = 24):
@@ -0,0 +1,17 @@
+"""Shared orjson encoder for WebSocket messages and webhook bodies."""
+from typing import Any
+import orjson
+
+# Datetimes (UTC as "Z"), dataclasses and NumPy scalars/arrays are encoded
+# natively; non-string dict keys are stringified like the stdlib encoder.
+JSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize obj to JSON bytes.
+
+    The str() fallback is only reached for types orjson cannot encode
+    natively (e.g. Path), so common payloads never call back into Python.
+    """
+    return orjson.dumps(obj, default=str, option=JSON_OPTIONS)
@@ -3,9 +3,12 @@ import aiohttp
 import time
 import logging
 import re
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional, Set
-from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+from datetime import datetime, timezone
 from urllib.parse import urljoin
 from app.config import settings
 from app.models import StreamConfig, SegmentMetrics, VariantStream, StreamEvent, EventType, LoudnessData
@@ -16,56 +19,102 @@ from app.services.ad_detector import ad_detector
 from app.services.metrics_calculator import metrics_calculator
 from app.services.logger_service import log_service
 from app.services.websocket_manager import ws_manager
-from app.services.ts_analyzer import ts_analyzer
+from app.services.ts_analyzer import TSAnalyzer
 from app.services.alert_service import alert_service
 from app.models import (
     StreamConfig, SegmentMetrics, VariantStream, StreamEvent, EventType, 
     LoudnessData, StreamHealth, TR101290Metrics, ManifestError, StreamStatus,
-    HealthScore, AudioMetrics, VideoMetrics, AlertModel
+    HealthScore, AudioMetrics, VideoMetrics
 )
 
 logger = logging.getLogger(__name__)
 
+# ATTRIBUTE=value pairs of an #EXT-X-STREAM-INF line (quoted values may contain commas)
+_STREAM_INF_ATTR_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+# Number of recent SegmentMetrics kept per stream
+METRICS_HISTORY_SIZE = 500
+
+
+@dataclass(slots=True)
+class StreamState:
+    """All per-stream monitoring state, kept in one object per stream_id."""
+    config: StreamConfig
+    health: StreamHealth
+    task: Optional[asyncio.Task] = None
+    seen_segments: Set[str] = field(default_factory=set)  # segment URIs already processed
+    segment_counter: int = 0
+    thumbnails_buffer: List = field(default_factory=list)  # [(path, timestamp), ...]
+    last_manifest_state: dict = field(default_factory=dict)  # {variant_count: int, ...}
+    # manifest URL -> (ETag, Last-Modified, body) for conditional GETs
+    manifest_cache: Dict[str, Tuple[Optional[str], Optional[str], bytes]] = field(default_factory=dict)
+    current_metrics: Optional[SegmentMetrics] = None
+    
+    # Tracking for health computation
+    metrics_history: Deque[SegmentMetrics] = field(
+        default_factory=lambda: deque(maxlen=METRICS_HISTORY_SIZE)
+    )  # recent metrics, oldest evicted on append
+    audio_metrics: Optional[AudioMetrics] = None  # latest audio metrics
+    video_metrics: Optional[VideoMetrics] = None  # latest video metrics
+    error_counts: Dict[str, int] = field(
+        default_factory=lambda: {"segment": 0, "manifest": 0, "download": 0}
+    )
+    last_sequence: int = -1  # last seen sequence number
+    segment_gaps: int = 0  # count of sequence gaps
+    scte35_count: int = 0  # SCTE-35 marker count
+    scte35_events: List[dict] = field(default_factory=list)
+    loudness_history: List[dict] = field(default_factory=list)  # recent loudness data
+    recording_enabled: bool = False
+    # TS analyzer holding this stream's CC/PCR/PID-classification state
+    ts_analyzer: TSAnalyzer = field(default_factory=TSAnalyzer)
+    # Health cache: metrics_version is bumped by writers; health_cache_key is the
+    # (metrics_version, alert version) the cached health was built from
+    metrics_version: int = 0
+    health_cache_key: Optional[Tuple[int, int]] = None
+
 
 class StreamMonitor:
     """Core HLS stream monitoring engine."""
     
     def __init__(self):
-        self.active_streams: Dict[str, StreamConfig] = {}
-        self.monitoring_tasks: Dict[str, asyncio.Task] = {}
-        self.seen_segments: Dict[str, Set[str]] = {}  # stream_id -> set of segment URIs
-        self.stream_metrics: Dict[str, SegmentMetrics] = {}
-        self.segment_counter: Dict[str, int] = {}  # stream_id -> segment count
-        self.thumbnails_buffer: Dict[str, List] = {}  # stream_id -> [(path, timestamp), ...]
-        self.stream_health: Dict[str, StreamHealth] = {} # stream_id -> StreamHealth
-        self.last_manifest_state: Dict[str, dict] = {} # stream_id -> {variant_count: int, ...}
-        
-        # New tracking for health computation
-        self.metrics_history: Dict[str, List[SegmentMetrics]] = {}  # stream_id -> recent metrics
-        self.audio_metrics: Dict[str, AudioMetrics] = {}  # stream_id -> latest audio metrics
-        self.video_metrics: Dict[str, VideoMetrics] = {}  # stream_id -> latest video metrics
-        self.error_counts: Dict[str, Dict[str, int]] = {}  # stream_id -> {error_type: count}
-        self.last_sequence: Dict[str, int] = {}  # stream_id -> last seen sequence number
-        self.segment_gaps: Dict[str, int] = {}  # stream_id -> count of sequence gaps
-        self.scte35_counts: Dict[str, int] = {}  # stream_id -> SCTE-35 marker count
-        self.scte35_events: Dict[str, List[dict]] = {}  # stream_id -> list of SCTE-35 events
-        self.loudness_history: Dict[str, List[dict]] = {}  # stream_id -> recent loudness data
-        self.recording_enabled: Dict[str, bool] = {}  # stream_id -> recording flag
+        # stream_id -> StreamState
+        self.streams: Dict[str, StreamState] = {}
         
         self.segments_dir = Path(settings.SEGMENTS_DIR)
         self.segments_dir.mkdir(parents=True, exist_ok=True)
         self.session: Optional[aiohttp.ClientSession] = None
+        
+        # Outbound events (WebSocket broadcasts, log writes) are queued and
+        # drained by a single worker so segment processing never waits on them
+        self.event_queue: asyncio.Queue = asyncio.Queue(maxsize=10000)
+        self.dropped_events = 0  # events discarded because the queue was full
+        self._event_pump_task: Optional[asyncio.Task] = None
     
     async def start(self):
         """Initialize the monitor."""
-        self.session = aiohttp.ClientSession()
+        # Keep-alive pool tuned for polling many streams off the same origin
+        connector = aiohttp.TCPConnector(
+            limit_per_host=32,
+            keepalive_timeout=75,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=10)
+        )
+        self._event_pump_task = asyncio.create_task(self._event_pump())
         logger.info("StreamMonitor started")
     
     async def stop(self):
         """Cleanup the monitor."""
         # Stop all monitoring tasks
-        for task in self.monitoring_tasks.values():
-            task.cancel()
+        for state in self.streams.values():
+            if state.task:
+                state.task.cancel()
+        
+        if self._event_pump_task:
+            self._event_pump_task.cancel()
         
         if self.session:
             await self.session.close()
@@ -74,126 +123,81 @@ class StreamMonitor:
     
     async def add_stream(self, stream_config: StreamConfig):
         """Add a stream to monitor."""
-        if stream_config.id in self.active_streams:
+        if stream_config.id in self.streams:
             logger.warning(f"Stream {stream_config.id} already being monitored")
             return
         
-        self.active_streams[stream_config.id] = stream_config
-        self.seen_segments[stream_config.id] = set()
-        self.segment_counter[stream_config.id] = 0
-        self.thumbnails_buffer[stream_config.id] = []
-        self.stream_health[stream_config.id] = StreamHealth(status=StreamStatus.STARTING)
-        self.last_manifest_state[stream_config.id] = {}
-        
-        # Initialize new tracking fields
-        self.metrics_history[stream_config.id] = []
-        self.error_counts[stream_config.id] = {"segment": 0, "manifest": 0, "download": 0}
-        self.last_sequence[stream_config.id] = -1
-        self.segment_gaps[stream_config.id] = 0
-        self.scte35_counts[stream_config.id] = 0
-        self.scte35_events[stream_config.id] = []
-        self.loudness_history[stream_config.id] = []
-        self.recording_enabled[stream_config.id] = False
+        state = StreamState(
+            config=stream_config,
+            health=StreamHealth(status=StreamStatus.STARTING)
+        )
+        self.streams[stream_config.id] = state
         
         # Start monitoring task
-        task = asyncio.create_task(self._monitor_stream(stream_config))
-        self.monitoring_tasks[stream_config.id] = task
+        state.task = asyncio.create_task(self._monitor_stream(stream_config))
         
         logger.info(f"Started monitoring stream: {stream_config.name} ({stream_config.id})")
         
-        # Log event (fire and forget - don't block)
-        asyncio.create_task(log_service.write_stream_event(
+        # Log event (queued - don't block)
+        self._enqueue(
+            log_service.write_stream_event,
             stream_config.id,
             "stream_added",
             f"Started monitoring stream: {stream_config.name}",
             severity="info",
             metadata={"manifest_url": stream_config.manifest_url}
-        ))
+        )
     
     async def remove_stream(self, stream_id: str):
         """Remove a stream from monitoring."""
-        if stream_id not in self.active_streams:
+        state = self.streams.pop(stream_id, None)
+        if state is None:
             return
         
         # Cancel monitoring task - don't wait, just cancel
-        if stream_id in self.monitoring_tasks:
+        if state.task:
             try:
-                self.monitoring_tasks[stream_id].cancel()
+                state.task.cancel()
             except Exception:
                 pass
-            del self.monitoring_tasks[stream_id]
-        
-        # Cleanup dictionaries - wrap in try/except to prevent any blocking
-        try:
-            if stream_id in self.active_streams:
-                del self.active_streams[stream_id]
-            if stream_id in self.seen_segments:
-                del self.seen_segments[stream_id]
-            if stream_id in self.segment_counter:
-                del self.segment_counter[stream_id]
-            if stream_id in self.thumbnails_buffer:
-                del self.thumbnails_buffer[stream_id]
-            if stream_id in self.stream_health:
-                del self.stream_health[stream_id]
-            if stream_id in self.last_manifest_state:
-                del self.last_manifest_state[stream_id]
-            if stream_id in self.metrics_history:
-                del self.metrics_history[stream_id]
-            if stream_id in self.audio_metrics:
-                del self.audio_metrics[stream_id]
-            if stream_id in self.video_metrics:
-                del self.video_metrics[stream_id]
-            if stream_id in self.error_counts:
-                del self.error_counts[stream_id]
-            if stream_id in self.last_sequence:
-                del self.last_sequence[stream_id]
-            if stream_id in self.segment_gaps:
-                del self.segment_gaps[stream_id]
-            if stream_id in self.scte35_counts:
-                del self.scte35_counts[stream_id]
-            if stream_id in self.scte35_events:
-                del self.scte35_events[stream_id]
-            if stream_id in self.loudness_history:
-                del self.loudness_history[stream_id]
-            if stream_id in self.recording_enabled:
-                del self.recording_enabled[stream_id]
-        except Exception as e:
-            logger.error(f"Error cleaning up stream data: {e}")
         
-        # Cleanup services - fire and forget
+        # Cleanup services (thumbnail file removal runs in a worker thread)
         try:
             alert_service.cleanup_stream(stream_id)
-            thumbnail_generator.cleanup_stream_thumbnails(stream_id)
+            await thumbnail_generator.cleanup_stream_thumbnails(stream_id)
         except Exception as e:
             logger.error(f"Error in service cleanup: {e}")
         
         logger.info(f"Stopped monitoring stream: {stream_id}")
         
-        # Fire and forget - don't await, just create task
-        asyncio.create_task(log_service.write_stream_event(
+        # Queued - don't await
+        self._enqueue(
+            log_service.write_stream_event,
             stream_id,
             "stream_removed",
             f"Stopped monitoring stream",
             severity="info"
-        ))
+        )
     
     async def _monitor_stream(self, stream_config: StreamConfig):
         """Main monitoring loop for a stream."""
         stream_id = stream_config.id
+        state = self.streams[stream_id]
         current_url = stream_config.manifest_url
         
         while True:
             try:
                 # Fetch manifest
-                manifest_content = await self._fetch_manifest(current_url)
+                manifest_content = await self._fetch_manifest(current_url, state)
                 
                 if manifest_content:
                     # Update status
-                    if stream_id in self.stream_health:
-                        self.stream_health[stream_id].status = StreamStatus.ONLINE
+                    state.health.status = StreamStatus.ONLINE
 
-                    # Parse manifest
-                    variant_streams, segments = self._parse_manifest(manifest_content, current_url)
+                    # Parse manifest (variants, segments and ad markers in one pass)
+                    variant_streams, segments, ad_markers = self._parse_manifest(
+                        manifest_content, current_url
+                    )
                     
                     # Handle Master Playlist
                     if not segments and variant_streams:
@@ -204,20 +208,19 @@ class StreamMonitor:
                         # Update URL to monitor the variant
                         current_url = best_variant.uri
                         
-                        # Log event (fire and forget)
-                        asyncio.create_task(log_service.write_event({
+                        # Log event (queued)
+                        self._enqueue(log_service.write_event, {
                             "event_type": "variant_selected",
                             "stream_id": stream_id,
                             "variant_info": best_variant.dict()
-                        }))
+                        })
                         
                         # Immediately continue to fetch the variant manifest
                         continue
 
-                    # Detect ads
-                    ad_markers = ad_detector.parse_manifest(manifest_content)
+                    # Broadcast detected ads
                     for marker in ad_markers:
-                        await self._broadcast_event(stream_id, "ad_detected", {
+                        self._broadcast_event(stream_id, "ad_detected", {
                             "type": marker.type,
                             "timestamp": marker.timestamp.isoformat(),
                             "duration": marker.duration,
@@ -225,21 +228,23 @@ class StreamMonitor:
                         })
                     
                     # Process new segments
-                    for segment_url in segments:
-                        if segment_url not in self.seen_segments[stream_id]:
-                            self.seen_segments[stream_id].add(segment_url)
+                    for segment_url, segment_duration in segments:
+                        if segment_url not in state.seen_segments:
+                            state.seen_segments.add(segment_url)
                             
                             # Process segment in background
-                            asyncio.create_task(self._process_segment(stream_id, segment_url))
+                            asyncio.create_task(
+                                self._process_segment(stream_id, segment_url, segment_duration)
+                            )
                     
                     # Broadcast manifest update
-                    await self._broadcast_event(stream_id, "manifest_updated", {
+                    self._broadcast_event(stream_id, "manifest_updated", {
                         "variant_count": len(variant_streams),
                         "segment_count": len(segments)
                     })
 
                     # Manifest Analysis
-                    await self._analyze_manifest_changes(stream_id, variant_streams, segments)
+                    self._analyze_manifest_changes(stream_id, variant_streams, segments)
                 
                 # Wait before next poll
                 await asyncio.sleep(settings.MANIFEST_POLL_INTERVAL)
@@ -247,21 +252,44 @@ class StreamMonitor:
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                if stream_id in self.stream_health:
-                    self.stream_health[stream_id].status = StreamStatus.ERROR
+                state.health.status = StreamStatus.ERROR
                 
                 logger.error(f"Error monitoring stream {stream_id}: {e}")
-                await self._broadcast_event(stream_id, "error", {
+                self._broadcast_event(stream_id, "error", {
                     "message": str(e)
                 })
                 await asyncio.sleep(settings.MANIFEST_POLL_INTERVAL)
     
-    async def _fetch_manifest(self, url: str) -> Optional[str]:
-        """Fetch HLS manifest."""
+    async def _fetch_manifest(self, url: str, state: Optional[StreamState] = None) -> Optional[bytes]:
+        """
+        Fetch HLS manifest as raw bytes (decoded lazily by the parser).
+        
+        When a stream state is given, the last ETag/Last-Modified for the URL
+        are sent as conditional headers and a 304 reuses the cached body.
+        """
+        headers = {}
+        cached = state.manifest_cache.get(url) if state is not None else None
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        
         try:
-            async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                if response.status == 200:
-                    return await response.text()
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304 and cached:
+                    return cached[2]
+                elif response.status == 200:
+                    body = await response.read()
+                    if state is not None:
+                        etag = response.headers.get('ETag')
+                        last_modified = response.headers.get('Last-Modified')
+                        if etag or last_modified:
+                            state.manifest_cache[url] = (etag, last_modified, body)
+                        else:
+                            state.manifest_cache.pop(url, None)
+                    return body
                 else:
                     logger.error(f"Failed to fetch manifest: {response.status} for URL: {url}")
                     return None
@@ -269,67 +297,111 @@ class StreamMonitor:
             logger.error(f"Error fetching manifest {url}: {e}")
             return None
     
-    def _parse_manifest(self, content: str, base_url: str) -> tuple:
-        """Parse HLS manifest to extract variant streams and segments."""
-        lines = content.split('\n')
+    def _parse_manifest(self, content: bytes, base_url: str) -> tuple:
+        """
+        Parse HLS manifest to extract variant streams, segments and ad markers.
+        
+        Works on the raw manifest bytes; only the attribute lines and URIs
+        that are actually used get decoded to str.
+        
+        Segments are returned as (url, duration) pairs, duration being the
+        #EXTINF value or None when it cannot be parsed.
+        """
+        lines = content.splitlines()
         variant_streams = []
         segments = []
+        ad_markers = []
         
         i = 0
         while i < len(lines):
             line = lines[i].strip()
             
             # Variant stream
-            if line.startswith('#EXT-X-STREAM-INF:'):
-                info = self._parse_stream_inf(line)
+            if line.startswith(b'#EXT-X-STREAM-INF:'):
+                info = self._parse_stream_inf(line.decode('utf-8', errors='replace'))
                 if i + 1 < len(lines):
                     uri = lines[i + 1].strip()
-                    if uri and not uri.startswith('#'):
-                        info['uri'] = urljoin(base_url, uri)
-                        variant_streams.append(VariantStream(**info))
-                i += 1
+                    if uri and not uri.startswith(b'#'):
+                        info['uri'] = urljoin(base_url, uri.decode('utf-8', errors='replace'))
+                        # Trusted parser output - skip validation
+                        variant_streams.append(VariantStream.model_construct(**info))
+                        i += 1
             
             # Media segment
-            elif line.startswith('#EXTINF:'):
+            elif line.startswith(b'#EXTINF:'):
                 if i + 1 < len(lines):
                     uri = lines[i + 1].strip()
-                    if uri and not uri.startswith('#'):
-                        segments.append(urljoin(base_url, uri))
-                i += 1
+                    if uri and not uri.startswith(b'#'):
+                        try:
+                            duration = float(line[8:].split(b',', 1)[0])
+                        except ValueError:
+                            duration = None
+                        segments.append((urljoin(base_url, uri.decode('utf-8', errors='replace')), duration))
+                        i += 1
+            
+            # Ad / splice markers
+            elif line.startswith(b'#') and (
+                line.startswith((b'#EXT-X-DATERANGE', b'#EXT-X-CUE-OUT', b'#EXT-X-CUE-IN'))
+                or b'BANDWIDTH-RESERVATION' in line.upper()
+            ):
+                marker = ad_detector.parse_tag(line.decode('utf-8', errors='replace'))
+                if marker:
+                    ad_markers.append(marker)
             
             i += 1
         
-        return variant_streams, segments
+        return variant_streams, segments, ad_markers
     
     def _parse_stream_inf(self, line: str) -> dict:
         """Parse #EXT-X-STREAM-INF attributes."""
         info = {}
-        
+
+        # Single pass over the attribute list
+        _, _, attr_list = line.partition(':')
+        attrs = dict(_STREAM_INF_ATTR_RE.findall(attr_list))
+
         # BANDWIDTH
-        bandwidth_match = re.search(r'BANDWIDTH=(\d+)', line)
-        if bandwidth_match:
-            info['bandwidth'] = int(bandwidth_match.group(1))
-        
+        bandwidth = attrs.get('BANDWIDTH')
+        if bandwidth and bandwidth.isdigit():
+            info['bandwidth'] = int(bandwidth)
+
         # RESOLUTION
-        resolution_match = re.search(r'RESOLUTION=(\d+x\d+)', line)
-        if resolution_match:
-            info['resolution'] = resolution_match.group(1)
-        
+        resolution = attrs.get('RESOLUTION')
+        if resolution:
+            info['resolution'] = resolution
+
         # CODECS
-        codecs_match = re.search(r'CODECS="([^"]+)"', line)
-        if codecs_match:
-            info['codecs'] = codecs_match.group(1)
-        
+        codecs = attrs.get('CODECS', '').strip('"')
+        if codecs:
+            info['codecs'] = codecs
+
         # FRAME-RATE
-        fps_match = re.search(r'FRAME-RATE=([0-9.]+)', line)
-        if fps_match:
-            info['frame_rate'] = float(fps_match.group(1))
-        
+        frame_rate = attrs.get('FRAME-RATE')
+        if frame_rate:
+            try:
+                info['frame_rate'] = float(frame_rate)
+            except ValueError:
+                pass
+
         return info
     
-    async def _process_segment(self, stream_id: str, segment_url: str):
-        """Download and process a segment."""
+    async def _process_segment(self, stream_id: str, segment_url: str,
+                               duration: Optional[float] = None):
+        """
+        Download and process a segment.
+        
+        duration: #EXTINF duration from the playlist; ffprobe is only spawned
+        when the playlist did not provide a usable value.
+        """
+        state = self.streams.get(stream_id)
+        if state is None:
+            return
+        
         try:
+            # One timestamp for every event emitted by this segment
+            now = datetime.now(timezone.utc)
+            now_iso = now.isoformat()
+            
             # Download segment with metrics
             segment_data = await self._download_segment(segment_url)
             
@@ -337,15 +409,16 @@ class StreamMonitor:
                 return
             
             # Save segment to disk
-            segment_filename = f"{stream_id}_{self.segment_counter[stream_id]}.ts"
+            segment_filename = f"{stream_id}_{state.segment_counter}.ts"
             segment_path = self.segments_dir / segment_filename
             
             # Use content from metrics download
             with open(segment_path, 'wb') as f:
                 f.write(segment_data['content'])
             
-            # Get segment duration (probe)
-            duration = await self._probe_duration(str(segment_path))
+            # Get segment duration (probe only if the playlist lacked it)
+            if not duration or duration <= 0:
+                duration = await self._probe_duration(str(segment_path))
             if not duration:
                 duration = 6.0  # Default fallback
             
@@ -359,8 +432,8 @@ class StreamMonitor:
             
             calculated_metrics = metrics_calculator.calculate_all_metrics(metrics_data)
             
-            # Create segment metrics
-            metrics = SegmentMetrics(
+            # Create segment metrics (values are computed internally, skip validation)
+            metrics = SegmentMetrics.model_construct(
                 uri=segment_url,
                 filename=segment_filename,
                 actual_bitrate=calculated_metrics['actual_bitrate'],
@@ -370,58 +443,56 @@ class StreamMonitor:
                 download_time=calculated_metrics['download_time'],
                 segment_size_bytes=calculated_metrics['segment_size_bytes'],
                 segment_size_mb=calculated_metrics['segment_size_mb'],
-                timestamp=datetime.utcnow(),
-                sequence_number=self.segment_counter[stream_id]
+                timestamp=now,
+                sequence_number=state.segment_counter
             )
 
             # Update current metrics
-            self.stream_metrics[stream_id] = metrics
+            state.current_metrics = metrics
             
-            # Add to metrics history (keep last 500)
-            if stream_id in self.metrics_history:
-                self.metrics_history[stream_id].append(metrics)
-                if len(self.metrics_history[stream_id]) > 500:
-                    self.metrics_history[stream_id] = self.metrics_history[stream_id][-500:]
+            # Add to metrics history (bounded ring buffer)
+            state.metrics_history.append(metrics)
+            state.metrics_version += 1
             
             # Update health score
             self._update_health_score(stream_id)
             
             # Generate thumbnail
             thumbnail_path = await thumbnail_generator.generate_thumbnail_for_segment(
-                stream_id, segment_url, str(segment_path), self.segment_counter[stream_id]
+                stream_id, segment_url, str(segment_path), state.segment_counter, duration
             )
             
             if thumbnail_path:
-                self.thumbnails_buffer[stream_id].append((thumbnail_path, metrics.timestamp))
+                state.thumbnails_buffer.append((thumbnail_path, metrics.timestamp))
                 
                 # Convert to relative URL for frontend
                 relative_path = f"/data/thumbnails/{Path(thumbnail_path).name}"
                 
-                await self._broadcast_event(stream_id, "thumbnail_generated", {
+                self._broadcast_event(stream_id, "thumbnail_generated", {
                     "thumbnail_path": relative_path,
-                    "sequence": self.segment_counter[stream_id]
-                })
+                    "sequence": state.segment_counter
+                }, ts=now_iso)
             
             # Generate sprite if buffer is full
-            if len(self.thumbnails_buffer[stream_id]) >= settings.SPRITE_SEGMENT_COUNT:
+            if len(state.thumbnails_buffer) >= settings.SPRITE_SEGMENT_COUNT:
                 await self._generate_sprite(stream_id)
             
             # Analyze loudness (async, don't wait)
             asyncio.create_task(self._analyze_loudness(stream_id, str(segment_path), metrics.timestamp))
 
-            # Analyze TS (async)
-            asyncio.create_task(self._analyze_ts(stream_id, str(segment_path)))
+            # Analyze TS (async) from the downloaded bytes, no re-read from disk
+            asyncio.create_task(self._analyze_ts(stream_id, segment_data['content']))
             
             # Increment counter
-            self.segment_counter[stream_id] += 1
+            state.segment_counter += 1
             
             # Broadcast segment event
             # Use json() to ensure datetime is serialized to ISO format, then load back to dict
             import json
-            await self._broadcast_event(stream_id, "segment_downloaded", json.loads(metrics.json()))
+            self._broadcast_event(stream_id, "segment_downloaded", json.loads(metrics.json()), ts=now_iso)
             
             # Log event
-            await log_service.write_event({
+            self._enqueue(log_service.write_event, {
                 "event_type": "segment_downloaded",
                 "stream_id": stream_id,
                 "segment_url": segment_url,
@@ -430,7 +501,7 @@ class StreamMonitor:
         
         except Exception as e:
             logger.error(f"Error processing segment {segment_url}: {e}")
-            await self._broadcast_event(stream_id, "error", {
+            self._broadcast_event(stream_id, "error", {
                 "message": f"Failed to process segment: {str(e)}",
                 "segment_url": segment_url
             })
@@ -495,7 +566,8 @@ class StreamMonitor:
             loudness_data = await loudness_analyzer.analyze_segment(segment_path)
             
             if loudness_data:
-                loudness = LoudnessData(
+                # ffmpeg-derived values are already typed - skip validation
+                loudness = LoudnessData.model_construct(
                     timestamp=timestamp,
                     **loudness_data
                 )
@@ -504,15 +576,17 @@ class StreamMonitor:
                 loudness_dict = json.loads(loudness.json())
                 
                 # Store in memory for quick access
-                if stream_id in self.loudness_history:
-                    self.loudness_history[stream_id].append(loudness_dict)
+                state = self.streams.get(stream_id)
+                if state is not None:
+                    state.loudness_history.append(loudness_dict)
                     # Keep last 200 entries
-                    if len(self.loudness_history[stream_id]) > 200:
-                        self.loudness_history[stream_id] = self.loudness_history[stream_id][-200:]
+                    if len(state.loudness_history) > 200:
+                        state.loudness_history = state.loudness_history[-200:]
                 
-                await self._broadcast_event(stream_id, "loudness_data", loudness_dict)
+                self._broadcast_event(stream_id, "loudness_data", loudness_dict)
                 
-                await log_service.write_stream_event(
+                self._enqueue(
+                    log_service.write_stream_event,
                     stream_id,
                     "loudness_analyzed",
                     "Loudness analysis complete",
@@ -525,7 +599,8 @@ class StreamMonitor:
     async def _generate_sprite(self, stream_id: str):
         """Generate sprite from buffered thumbnails."""
         try:
-            buffer = self.thumbnails_buffer[stream_id]
+            state = self.streams[stream_id]
+            buffer = state.thumbnails_buffer
             if not buffer:
                 return
             
@@ -535,15 +610,15 @@ class StreamMonitor:
             sprite_info = sprite_generator.generate_sprite(stream_id, thumbnail_paths, timestamps)
             
             # Clear buffer
-            self.thumbnails_buffer[stream_id] = []
+            state.thumbnails_buffer = []
             
-            await self._broadcast_event(stream_id, "sprite_generated", {
+            self._broadcast_event(stream_id, "sprite_generated", {
                 "sprite_id": sprite_info.sprite_id,
                 "sprite_path": sprite_info.sprite_path,
                 "thumbnail_count": sprite_info.thumbnail_count
             })
             
-            await log_service.write_event({
+            self._enqueue(log_service.write_event, {
                 "event_type": "sprite_generated",
                 "stream_id": stream_id,
                 "sprite_info": sprite_info.dict()
@@ -552,106 +627,178 @@ class StreamMonitor:
         except Exception as e:
             logger.error(f"Error generating sprite: {e}")
     
-    async def _analyze_ts(self, stream_id: str, segment_path: str):
+    async def _analyze_ts(self, stream_id: str, segment_data: bytes):
         """Analyze MPEG-TS structure."""
         try:
+            state = self.streams.get(stream_id)
+            if state is None:
+                return
+            
             # Run analysis in thread pool to avoid blocking
-            metrics = await asyncio.to_thread(ts_analyzer.analyze_segment, segment_path)
+            metrics = await asyncio.to_thread(state.ts_analyzer.analyze_segment_bytes, segment_data)
             
-            if stream_id in self.stream_health:
-                health = self.stream_health[stream_id]
+            # The stream may have been removed while the analysis ran
+            if self.streams.get(stream_id) is state:
+                health = state.health
+                now = datetime.now(timezone.utc)
+                now_iso = now.isoformat()
                 
                 # Update metrics
                 health.tr101290_metrics.sync_byte_errors += metrics.sync_byte_errors
                 health.tr101290_metrics.continuity_errors += metrics.continuity_errors
                 health.tr101290_metrics.transport_errors += metrics.transport_errors
-                health.tr101290_metrics.last_updated = datetime.utcnow()
+                health.tr101290_metrics.last_updated = now
+                if metrics.sync_byte_errors or metrics.continuity_errors or metrics.transport_errors:
+                    state.metrics_version += 1
                 
                 # Check for alarms
                 if metrics.sync_byte_errors > 0:
-                    await self._raise_alarm(stream_id, "sync_byte_error", "Sync byte errors detected")
+                    self._raise_alarm(stream_id, "sync_byte_error", "Sync byte errors detected", ts=now_iso)
                 if metrics.continuity_errors > 0:
-                    await self._raise_alarm(stream_id, "continuity_error", "Continuity counter errors detected")
+                    self._raise_alarm(stream_id, "continuity_error", "Continuity counter errors detected", ts=now_iso)
                 
                 # Store SCTE-35 events if detected
                 if metrics.scte35_messages > 0:
                     event = {
-                        "timestamp": datetime.utcnow().isoformat(),
+                        "timestamp": now_iso,
                         "event_type": "scte35_marker",
-                        "segment_sequence": self.segment_counter.get(stream_id, 0),
+                        "segment_sequence": state.segment_counter,
                         "message_count": metrics.scte35_messages,
                         "pids": metrics.scte35_pids
                     }
                     
-                    if stream_id not in self.scte35_events:
-                        self.scte35_events[stream_id] = []
-                    self.scte35_events[stream_id].append(event)
+                    state.scte35_events.append(event)
                     
                     # Keep only last 100 events
-                    if len(self.scte35_events[stream_id]) > 100:
-                        self.scte35_events[stream_id] = self.scte35_events[stream_id][-100:]
+                    if len(state.scte35_events) > 100:
+                        state.scte35_events = state.scte35_events[-100:]
                     
                     # Update count
-                    if stream_id in self.scte35_counts:
-                        self.scte35_counts[stream_id] += metrics.scte35_messages
+                    state.scte35_count += metrics.scte35_messages
                     
                     # Broadcast SCTE-35 event
-                    await self._broadcast_event(stream_id, "scte35_detected", event)
+                    self._broadcast_event(stream_id, "scte35_detected", event, ts=now_iso)
                     
                     logger.info(f"SCTE-35 detected in stream {stream_id}: {metrics.scte35_messages} messages")
                 
                 # Broadcast update
-                await self._broadcast_event(stream_id, "health_update", health.dict())
+                self._broadcast_event(stream_id, "health_update", health.dict(), ts=now_iso)
                 
         except Exception as e:
             logger.error(f"Error in TS analysis: {e}")
 
-    async def _analyze_manifest_changes(self, stream_id: str, variants: List[VariantStream], segments: List[str]):
+    def _analyze_manifest_changes(self, stream_id: str, variants: List[VariantStream], segments: List[tuple]):
         """Analyze manifest for changes and errors."""
         try:
-            last_state = self.last_manifest_state.get(stream_id, {})
+            state = self.streams.get(stream_id)
+            if state is None:
+                return
+            last_state = state.last_manifest_state
             
             # Check Variant Count
             if "variant_count" in last_state:
                 if last_state["variant_count"] != len(variants):
-                    await self._raise_alarm(stream_id, "variant_count_changed", 
+                    self._raise_alarm(stream_id, "variant_count_changed", 
                         f"Variant count changed from {last_state['variant_count']} to {len(variants)}")
             
             # Update state
-            self.last_manifest_state[stream_id] = {
+            state.last_manifest_state = {
                 "variant_count": len(variants),
-                "last_check": datetime.utcnow()
+                "last_check": datetime.now(timezone.utc)
             }
             
         except Exception as e:
             logger.error(f"Error in manifest analysis: {e}")
 
-    async def _raise_alarm(self, stream_id: str, alarm_type: str, description: str):
+    def _raise_alarm(self, stream_id: str, alarm_type: str, description: str,
+                     ts: Optional[str] = None):
         """Raise a stream alarm."""
+        ts = ts or datetime.now(timezone.utc).isoformat()
+        
         # Implementation for raising alarms (simplified)
-        await self._broadcast_event(stream_id, "alarm", {
+        self._broadcast_event(stream_id, "alarm", {
             "type": alarm_type,
             "description": description,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+            "timestamp": ts
+        }, ts=ts)
 
-    async def _broadcast_event(self, stream_id: str, event_type: str, data: dict):
-        """Broadcast event via WebSocket."""
+    def _broadcast_event(self, stream_id: str, event_type: str, data: dict,
+                         ts: Optional[str] = None):
+        """
+        Queue an event for WebSocket broadcast.
+        
+        ts: ISO timestamp shared by the caller's processing cycle; generated
+        here when not supplied.
+        """
         message = {
             "type": event_type,
             "stream_id": stream_id,
             "data": data,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": ts or datetime.now(timezone.utc).isoformat()
         }
         
-        await ws_manager.broadcast(stream_id, message)
+        self._enqueue(ws_manager.broadcast, stream_id, message)
+    
+    def _enqueue(self, func: Callable[..., Awaitable[Any]], *args, **kwargs):
+        """Queue an outbound call for the event pump, dropping the oldest when full."""
+        item = (func, args, kwargs)
+        try:
+            self.event_queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                self.event_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.event_queue.put_nowait(item)
+            self.dropped_events += 1
+            if self.dropped_events == 1 or self.dropped_events % 1000 == 0:
+                logger.warning(f"Event queue full, dropped {self.dropped_events} oldest event(s) so far")
+    
+    async def _event_pump(self):
+        """Drain the event queue, dispatching to the WebSocket manager and log service."""
+        while True:
+            func, args, kwargs = await self.event_queue.get()
+            try:
+                await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error dispatching event: {e}")
+            
+            # Queue.get() does not suspend while items are waiting, so yield
+            # explicitly to let WebSocket writer tasks drain between events
+            await asyncio.sleep(0)
     
     def _update_health_score(self, stream_id: str):
-        """Compute and update the health score for a stream."""
-        if stream_id not in self.stream_health:
+        """
+        Update the health score for a stream.
+        
+        The cached health is reused while neither the stream's metrics
+        version nor its alert version has advanced. The score is only
+        recomputed on new metrics; the alert list is rebuilt when alerts
+        change (raise, resolve, acknowledge).
+        """
+        state = self.streams.get(stream_id)
+        if state is None:
             return
         
-        health = self.stream_health[stream_id]
+        cache_key = state.health_cache_key
+        if cache_key is not None and cache_key[0] == state.metrics_version:
+            if cache_key[1] == alert_service.get_version(stream_id):
+                return
+        else:
+            # May raise/resolve alerts, so read the alert version afterwards
+            self._compute_health_score(stream_id, state)
+        
+        state.health_cache_key = (state.metrics_version, alert_service.get_version(stream_id))
+        
+        # Get active alerts for health status
+        active_alerts = alert_service.get_active_alerts(stream_id)
+        state.health.active_alerts = [alert_service.get_model(a) for a in active_alerts]
+    
+    def _compute_health_score(self, stream_id: str, state: StreamState):
+        """Compute the health score and check alert thresholds."""
+        health = state.health
         
         # Get TR 101 290 metrics
         tr_metrics = health.tr101290_metrics
@@ -659,8 +806,9 @@ class StreamMonitor:
         # Calculate average TTFB from recent metrics
         ttfb_avg = 0.0
         download_ratio = 1.0
-        if stream_id in self.metrics_history and self.metrics_history[stream_id]:
-            recent = self.metrics_history[stream_id][-20:]  # Last 20 segments
+        if state.metrics_history:
+            history = state.metrics_history
+            recent = list(islice(history, max(0, len(history) - 20), None))  # Last 20 segments
             if recent:
                 ttfb_avg = sum(m.ttfb for m in recent) / len(recent)
                 # download_speed is in Mbps, compare with actual_bitrate
@@ -685,17 +833,16 @@ class StreamMonitor:
         
         # Update health
         health.health_score = health_score
-        health.last_updated = datetime.utcnow()
+        health.last_updated = datetime.now(timezone.utc)
         
         # Add audio/video metrics if available
-        if stream_id in self.audio_metrics:
-            health.audio_metrics = self.audio_metrics[stream_id]
-        if stream_id in self.video_metrics:
-            video_metrics = self.video_metrics[stream_id]
+        if state.audio_metrics is not None:
+            health.audio_metrics = state.audio_metrics
+        if state.video_metrics is not None:
+            video_metrics = state.video_metrics
             # Add SCTE-35 stats
-            if stream_id in self.scte35_counts:
-                video_metrics.scte35_count = self.scte35_counts[stream_id]
-                video_metrics.scte35_detected = self.scte35_counts[stream_id] > 0
+            video_metrics.scte35_count = state.scte35_count
+            video_metrics.scte35_detected = state.scte35_count > 0
             health.video_metrics = video_metrics
         
         # Check thresholds and raise/resolve alerts
@@ -707,38 +854,24 @@ class StreamMonitor:
             ttfb_avg=ttfb_avg,
             download_ratio=download_ratio
         )
-        
-        # Get active alerts for health status
-        active_alerts = alert_service.get_active_alerts(stream_id)
-        health.active_alerts = [
-            AlertModel(
-                alert_id=a.alert_id,
-                stream_id=a.stream_id,
-                alert_type=a.alert_type.value,
-                severity=a.severity.value,
-                message=a.message,
-                timestamp=a.timestamp,
-                metadata=a.metadata,
-                acknowledged=a.acknowledged,
-                resolved=a.resolved,
-                resolved_at=a.resolved_at
-            ) for a in active_alerts
-        ]
     
     def get_stream_health(self, stream_id: str) -> Optional[StreamHealth]:
         """Get the current health status for a stream."""
-        if stream_id not in self.stream_health:
+        state = self.streams.get(stream_id)
+        if state is None:
             return None
         
         # Update health score before returning
         self._update_health_score(stream_id)
-        return self.stream_health[stream_id]
+        return state.health
     
     def get_metrics_history(self, stream_id: str, limit: int = 100) -> List[SegmentMetrics]:
         """Get recent metrics history for a stream."""
-        if stream_id not in self.metrics_history:
+        state = self.streams.get(stream_id)
+        if state is None:
             return []
-        return self.metrics_history[stream_id][-limit:]
+        history = state.metrics_history
+        return list(islice(history, max(0, len(history) - limit), None))
     
     def get_latest_thumbnail_path(self, stream_id: str) -> Optional[str]:
         """Get the path to the latest thumbnail for a stream."""
@@ -747,5 +880,3 @@ class StreamMonitor:
 
 # Global instance
 stream_monitor = StreamMonitor()
-
-stream_monitor = StreamMonitor()
@@ -1,8 +1,11 @@
 import asyncio
 import logging
+import os
+import shutil
 import time
+from collections import Counter, defaultdict, deque
 from pathlib import Path
-from typing import Optional, Dict, Tuple
+from typing import Optional, Deque, Dict, List, Tuple
 from PIL import Image, ImageDraw, ImageFont
 from app.config import settings
 
@@ -15,25 +18,73 @@ class ThumbnailGenerator:
     
     Features:
     - FFmpeg-based thumbnail extraction
-    - 30-60 second cache TTL
+    - Per-stream cache TTL following the segment duration
     - Error placeholder generation
     - Automatic cleanup of old thumbnails
     """
     
-    # Cache TTL in seconds
-    CACHE_TTL = 45  # 30-60 second range, use 45 as middle
+    # Cache TTL in seconds: two segment durations, at least MIN_CACHE_TTL. The
+    # next thumbnail lands a segment later plus download/ffmpeg time, so one
+    # duration would expire the entry before it is replaced.
+    MIN_CACHE_TTL = 5
+    DEFAULT_CACHE_TTL = 15  # segment duration unknown
+    
+    # Thumbnails kept on disk per stream
+    KEEP_THUMBNAILS = 50
+    
+    # Input seek offset (seconds) for thumbnails when no timestamp is given
+    SEEK_OFFSET = 1
+    
+    # Coalescing of thumbnail requests that arrive together for one stream
+    BATCH_DEBOUNCE = 0.1  # seconds to wait for more requests
+    BATCH_MAX_SIZE = 8  # segments per ffmpeg process
     
     def __init__(self):
         self.thumbnails_dir = Path(settings.THUMBNAILS_DIR)
         self.thumbnails_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Optional RAM-backed work dir; thumbnails are published to thumbnails_dir
+        self.tmp_dir: Optional[Path] = None
+        if settings.THUMBNAILS_TMP_DIR:
+            self.tmp_dir = Path(settings.THUMBNAILS_TMP_DIR)
+            self.tmp_dir.mkdir(parents=True, exist_ok=True)
         self.width = settings.THUMBNAIL_WIDTH
         self.height = settings.THUMBNAIL_HEIGHT
         
-        # Cache: stream_id -> (thumbnail_path, timestamp, sequence)
-        self._cache: Dict[str, Tuple[str, float, int]] = {}
+        # Cache: stream_id -> (thumbnail_path, timestamp, sequence, ttl)
+        self._cache: Dict[str, Tuple[str, float, int, float]] = {}
         
         # Track all generated thumbnails for cleanup
-        self._thumbnail_registry: Dict[str, Dict[int, Tuple[str, float]]] = {}  # stream_id -> {seq: (path, time)}
+        # stream_id -> deque[(seq, path, time)], oldest first
+        self._thumbnail_registry: Dict[str, Deque[Tuple[int, str, float]]] = defaultdict(
+            lambda: deque(maxlen=self.KEEP_THUMBNAILS)
+        )
+        
+        # Error placeholder assets, built once and reused
+        try:
+            self._font = ImageFont.truetype("arial.ttf", 12)
+        except OSError:
+            self._font = ImageFont.load_default()
+        self._error_template = self._build_error_template()
+        
+        # Bound concurrent ffmpeg/ffprobe processes to what the host can schedule
+        max_procs = settings.FFMPEG_MAX_CONCURRENCY or max(2, (os.cpu_count() or 2) // 2)
+        self._ff_sem = asyncio.Semaphore(max_procs)
+        
+        # Per-stream batching: queued (segment_path, output_path, future) and its worker
+        self._batch_queues: Dict[str, asyncio.Queue] = {}
+        self._batch_workers: Dict[str, asyncio.Task] = {}
+        
+        # Cache lookup counters (see get_stats)
+        self._stats: Counter = Counter()
+        
+        # Subprocess counters for observability
+        self.subprocess_stats: Dict[str, int] = {
+            "spawned_total": 0,
+            "failed_total": 0,
+            "waiting": 0,
+            "running": 0,
+        }
     
     def get_cached_thumbnail(self, stream_id: str) -> Optional[str]:
         """
@@ -46,17 +97,35 @@ class ThumbnailGenerator:
             Path to cached thumbnail or None if cache expired/missing
         """
         if stream_id not in self._cache:
+            self._stats["cache_misses"] += 1
             return None
         
-        path, cached_time, _ = self._cache[stream_id]
+        path, cached_time, _, ttl = self._cache[stream_id]
         
         # Check if cache is still valid
-        if time.time() - cached_time < self.CACHE_TTL:
+        if time.time() - cached_time < ttl:
             if Path(path).exists():
+                self._stats["cache_hits"] += 1
                 return path
+            self._stats["cache_miss_file_gone"] += 1
+            return None
         
+        self._stats["cache_expires"] += 1
         return None
     
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache lookup and ffmpeg subprocess counters."""
+        stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "cache_expires": 0,
+            "cache_miss_file_gone": 0,
+        }
+        stats.update(self._stats)
+        for key, value in self.subprocess_stats.items():
+            stats[f"ffmpeg_{key}"] = value
+        return stats
+    
     def get_latest_thumbnail_info(self, stream_id: str) -> Optional[Dict]:
         """
         Get information about the latest cached thumbnail.
@@ -67,17 +136,18 @@ class ThumbnailGenerator:
         if stream_id not in self._cache:
             return None
         
-        path, cached_time, sequence = self._cache[stream_id]
+        path, cached_time, sequence, ttl = self._cache[stream_id]
         
         if not Path(path).exists():
             return None
         
+        age = time.time() - cached_time
         return {
             "path": path,
             "cached_at": cached_time,
             "sequence_number": sequence,
-            "expires_in": max(0, self.CACHE_TTL - (time.time() - cached_time)),
-            "is_fresh": time.time() - cached_time < self.CACHE_TTL
+            "expires_in": max(0, ttl - age),
+            "is_fresh": age < ttl
         }
     
     async def extract_thumbnail(self, segment_path: str, output_path: str, 
@@ -88,42 +158,33 @@ class ThumbnailGenerator:
         Args:
             segment_path: Path to the segment file
             output_path: Path where thumbnail should be saved
-            timestamp: Timestamp in seconds (uses mid-point if None)
+            timestamp: Timestamp in seconds (uses SEEK_OFFSET, or the
+                mid-point for segments shorter than that, if None)
         
         Returns:
             True if successful, False otherwise
         """
         try:
-            # If no timestamp, extract from middle
             if timestamp is None:
-                # Get duration first
+                # Fast path: input-seek to a fixed offset, no ffprobe round trip
+                returncode, stderr = await self._extract_frame(
+                    segment_path, output_path, self.SEEK_OFFSET, pick_representative=True
+                )
+                if returncode == 0 and self._has_output(output_path):
+                    logger.debug(f"Thumbnail generated: {output_path}")
+                    return True
+                
+                if not self._is_seek_past_eof(stderr):
+                    logger.warning(f"FFmpeg error for {segment_path}: {stderr.decode()[:200]}")
+                    return False
+                
+                # Segment shorter than the offset: fall back to its mid-point
                 duration = await self._get_duration(segment_path)
-                if duration:
-                    timestamp = duration / 2
-                else:
-                    timestamp = 0
+                timestamp = duration / 2 if duration else 0
             
-            # FFmpeg command to extract frame
-            command = [
-                'ffmpeg',
-                '-ss', str(timestamp),
-                '-i', segment_path,
-                '-vframes', '1',
-                '-vf', f'scale={self.width}:{self.height}',
-                '-strict', 'unofficial',  # Allow non-standard YUV
-                '-y',  # Overwrite
-                output_path
-            ]
-            
-            process = await asyncio.create_subprocess_exec(
-                *command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
+            returncode, stderr = await self._extract_frame(segment_path, output_path, timestamp)
             
-            if process.returncode == 0:
+            if returncode == 0 and self._has_output(output_path):
                 logger.debug(f"Thumbnail generated: {output_path}")
                 return True
             else:
@@ -134,6 +195,146 @@ class ThumbnailGenerator:
             logger.error(f"Error extracting thumbnail: {e}")
             return False
     
+    async def _extract_frame(self, segment_path: str, output_path: str, timestamp: float,
+                             pick_representative: bool = False) -> Tuple[int, bytes]:
+        """
+        Run a single ffmpeg process that writes one scaled frame.
+        
+        -ss is placed before -i so ffmpeg seeks the input instead of
+        decoding up to the timestamp.
+        
+        Returns:
+            (returncode, stderr)
+        """
+        video_filter = f'scale={self.width}:{self.height}'
+        if pick_representative:
+            video_filter = f'thumbnail,{video_filter}'
+        
+        command = [
+            'ffmpeg',
+            '-ss', str(timestamp),
+            '-i', segment_path,
+            '-frames:v', '1',
+            '-vf', video_filter,
+            '-an',
+            '-threads', '1',  # Parallelism comes from the process semaphore
+            '-strict', 'unofficial',  # Allow non-standard YUV
+            '-y',  # Overwrite
+            output_path
+        ]
+        
+        returncode, _, stderr = await self._run_subprocess(command)
+        return returncode, stderr
+    
+    async def _extract_batched(self, stream_id: str, segment_path: str, output_path: str) -> bool:
+        """
+        Queue a thumbnail extraction for the stream's batch worker.
+        
+        Returns:
+            True if the thumbnail was written, False otherwise
+        """
+        queue = self._batch_queues.get(stream_id)
+        if queue is None:
+            queue = self._batch_queues[stream_id] = asyncio.Queue()
+        
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((segment_path, output_path, future))
+        
+        if stream_id not in self._batch_workers:
+            self._batch_workers[stream_id] = asyncio.create_task(self._batch_worker(stream_id, queue))
+        
+        return await future
+    
+    async def _batch_worker(self, stream_id: str, queue: asyncio.Queue):
+        """Drain a stream's queue, running one ffmpeg per batch; exits when idle."""
+        batch = []
+        try:
+            while not queue.empty():
+                # Give segments arriving together (catch-up) a moment to queue up
+                await asyncio.sleep(self.BATCH_DEBOUNCE)
+                
+                batch = []
+                while not queue.empty() and len(batch) < self.BATCH_MAX_SIZE:
+                    batch.append(queue.get_nowait())
+                
+                try:
+                    if len(batch) == 1:
+                        segment_path, output_path, _ = batch[0]
+                        results = [await self.extract_thumbnail(segment_path, output_path)]
+                    else:
+                        results = await self._extract_batch(batch)
+                except Exception as e:
+                    logger.error(f"Error in thumbnail batch for {stream_id}: {e}")
+                    results = [False] * len(batch)
+                
+                for (_, _, future), success in zip(batch, results):
+                    if not future.done():
+                        future.set_result(success)
+        finally:
+            # If cancelled (stream removed) or failed mid-batch, release the
+            # callers still awaiting results instead of leaving them hanging
+            for _, _, future in batch:
+                if not future.done():
+                    future.cancel()
+            while not queue.empty():
+                _, _, future = queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+            
+            # No await between the empty check and here, so nothing can slip in
+            if self._batch_workers.get(stream_id) is asyncio.current_task():
+                del self._batch_workers[stream_id]
+            if self._batch_queues.get(stream_id) is queue:
+                del self._batch_queues[stream_id]
+    
+    async def _extract_batch(self, batch: List[Tuple[str, str, asyncio.Future]]) -> List[bool]:
+        """
+        Extract one thumbnail per segment with a single ffmpeg process.
+        
+        Each segment is a separate input mapped to its own image output, so
+        ffmpeg startup is paid once for the whole batch. Segments the batch
+        could not render (e.g. shorter than SEEK_OFFSET, or one input without
+        video failing the whole command) are retried one by one.
+        """
+        command = ['ffmpeg']
+        for segment_path, _, _ in batch:
+            command += ['-ss', str(self.SEEK_OFFSET), '-i', segment_path]
+        command.append('-y')
+        for index, (_, output_path, _) in enumerate(batch):
+            command += [
+                '-map', f'{index}:v:0',
+                '-frames:v', '1',
+                '-vf', f'thumbnail,scale={self.width}:{self.height}',
+                '-threads', '1',
+                '-strict', 'unofficial',
+                output_path
+            ]
+        
+        returncode, _, stderr = await self._run_subprocess(command)
+        if returncode != 0:
+            logger.debug(f"Batch thumbnail extraction failed: {stderr.decode()[:200]}")
+        
+        results = []
+        for segment_path, output_path, _ in batch:
+            if returncode == 0 and self._has_output(output_path):
+                results.append(True)
+            else:
+                results.append(await self.extract_thumbnail(segment_path, output_path))
+        return results
+    
+    @staticmethod
+    def _has_output(output_path: str) -> bool:
+        """Check that ffmpeg actually wrote a non-empty image."""
+        try:
+            return os.path.getsize(output_path) > 0
+        except OSError:
+            return False
+    
+    @staticmethod
+    def _is_seek_past_eof(stderr: bytes) -> bool:
+        """Check whether ffmpeg produced nothing because the seek passed the end."""
+        return b'nothing was encoded' in stderr or b'Output file is empty' in stderr
+    
     async def _get_duration(self, segment_path: str) -> Optional[float]:
         """Get duration of a video file using FFprobe."""
         try:
@@ -145,15 +346,9 @@ class ThumbnailGenerator:
                 segment_path
             ]
             
-            process = await asyncio.create_subprocess_exec(
-                *command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
+            returncode, stdout, stderr = await self._run_subprocess(command)
             
-            if process.returncode == 0:
+            if returncode == 0:
                 output = stdout.decode().strip()
                 if not output or output == 'N/A':
                     return None
@@ -164,25 +359,61 @@ class ThumbnailGenerator:
             logger.error(f"Error getting duration: {e}")
             return None
     
+    async def _run_subprocess(self, command: list) -> Tuple[int, bytes, bytes]:
+        """
+        Run an ffmpeg/ffprobe command under the concurrency limit.
+        
+        Returns:
+            (returncode, stdout, stderr)
+        """
+        stats = self.subprocess_stats
+        stats["waiting"] += 1
+        try:
+            await self._ff_sem.acquire()
+        finally:
+            stats["waiting"] -= 1
+        
+        stats["running"] += 1
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stats["spawned_total"] += 1
+            
+            stdout, stderr = await process.communicate()
+            if process.returncode != 0:
+                stats["failed_total"] += 1
+            return process.returncode, stdout, stderr
+        except Exception:
+            stats["failed_total"] += 1
+            raise
+        finally:
+            stats["running"] -= 1
+            self._ff_sem.release()
+    
+    def _build_error_template(self) -> Image.Image:
+        """Build the static part of the error placeholder (background + X icon)."""
+        img = Image.new('RGB', (self.width, self.height), color='#4a5568')
+        draw = ImageDraw.Draw(img)
+        
+        # Draw error icon (X)
+        center_x, center_y = self.width // 2, self.height // 2
+        draw.line([(center_x - 10, center_y - 10), (center_x + 10, center_y + 10)], 
+                 fill='#e53e3e', width=3)
+        draw.line([(center_x - 10, center_y + 10), (center_x + 10, center_y - 10)], 
+                 fill='#e53e3e', width=3)
+        return img
+    
     def generate_error_thumbnail(self, output_path: str, error_message: str = "Decode Error"):
         """Generate a gray error placeholder thumbnail."""
         try:
-            # Create gray image
-            img = Image.new('RGB', (self.width, self.height), color='#4a5568')
+            # Start from the prebuilt gray background with the error icon
+            img = self._error_template.copy()
             draw = ImageDraw.Draw(img)
-            
-            # Try to use a font, fallback to default
-            try:
-                font = ImageFont.truetype("arial.ttf", 12)
-            except:
-                font = ImageFont.load_default()
-            
-            # Draw error icon (X)
-            center_x, center_y = self.width // 2, self.height // 2
-            draw.line([(center_x - 10, center_y - 10), (center_x + 10, center_y + 10)], 
-                     fill='#e53e3e', width=3)
-            draw.line([(center_x - 10, center_y + 10), (center_x + 10, center_y - 10)], 
-                     fill='#e53e3e', width=3)
+            font = self._font
+            center_y = self.height // 2
             
             # Draw text
             text_bbox = draw.textbbox((0, 0), error_message, font=font)
@@ -200,7 +431,8 @@ class ThumbnailGenerator:
             return False
     
     async def generate_thumbnail_for_segment(self, stream_id: str, segment_uri: str, 
-                                              segment_path: str, sequence: int) -> Optional[str]:
+                                              segment_path: str, sequence: int,
+                                              segment_duration: Optional[float] = None) -> Optional[str]:
         """
         Generate thumbnail for a segment and return the path.
         Updates the cache with the new thumbnail.
@@ -210,6 +442,7 @@ class ThumbnailGenerator:
             segment_uri: URI of the segment
             segment_path: Local path to downloaded segment
             sequence: Sequence number
+            segment_duration: Segment duration in seconds, used to size the cache TTL
         
         Returns:
             Path to thumbnail or None if failed
@@ -218,83 +451,105 @@ class ThumbnailGenerator:
         filename = f"{stream_id}_{sequence}.jpg"
         output_path = str(self.thumbnails_dir / filename)
         
-        # Try to extract thumbnail
-        success = await self.extract_thumbnail(segment_path, output_path)
+        # Render into the tmpfs work dir when configured, then publish
+        work_path = str(self.tmp_dir / filename) if self.tmp_dir else output_path
+        
+        # Try to extract thumbnail (coalesced with other pending segments of the stream)
+        success = await self._extract_batched(stream_id, segment_path, work_path)
         
         if not success:
             # Generate error thumbnail
-            self.generate_error_thumbnail(output_path, "No Video")
+            self.generate_error_thumbnail(work_path, "No Video")
+        
+        if work_path != output_path:
+            # Cross-filesystem publish falls back to a copy; keep it off the loop
+            await asyncio.to_thread(self._publish, work_path, output_path)
         
         # Update cache
         current_time = time.time()
-        self._cache[stream_id] = (output_path, current_time, sequence)
+        if segment_duration and segment_duration > 0:
+            ttl = max(2 * segment_duration, self.MIN_CACHE_TTL)
+        else:
+            ttl = self.DEFAULT_CACHE_TTL
+        self._cache[stream_id] = (output_path, current_time, sequence, ttl)
         
-        # Register thumbnail
-        if stream_id not in self._thumbnail_registry:
-            self._thumbnail_registry[stream_id] = {}
-        self._thumbnail_registry[stream_id][sequence] = (output_path, current_time)
+        # Register thumbnail; a full deque evicts its oldest entry on append
+        registry = self._thumbnail_registry[stream_id]
+        evicted = registry[0] if len(registry) == registry.maxlen else None
+        registry.append((sequence, output_path, current_time))
         
-        # Cleanup old thumbnails for this stream (keep last 50)
-        await self._cleanup_old_thumbnails(stream_id)
+        if evicted is not None and evicted[0] != sequence:
+            await asyncio.to_thread(self._remove_file, evicted[1])
         
         return output_path
     
-    async def _cleanup_old_thumbnails(self, stream_id: str, keep_count: int = 50):
-        """Remove old thumbnails for a stream, keeping only the most recent ones."""
-        if stream_id not in self._thumbnail_registry:
-            return
-        
-        registry = self._thumbnail_registry[stream_id]
-        
-        if len(registry) <= keep_count:
-            return
-        
-        # Sort by sequence number
-        sorted_sequences = sorted(registry.keys())
-        
-        # Remove oldest thumbnails
-        to_remove = sorted_sequences[:-keep_count]
-        
-        for seq in to_remove:
-            path, _ = registry.pop(seq)
-            try:
-                file_path = Path(path)
-                if file_path.exists():
-                    file_path.unlink()
-                    logger.debug(f"Cleaned up old thumbnail: {path}")
-            except Exception as e:
-                logger.error(f"Error removing old thumbnail {path}: {e}")
+    @staticmethod
+    def _remove_file(path: str):
+        """Delete a thumbnail file if it still exists."""
+        try:
+            Path(path).unlink(missing_ok=True)
+            logger.debug(f"Cleaned up old thumbnail: {path}")
+        except Exception as e:
+            logger.error(f"Error removing old thumbnail {path}: {e}")
     
-    def cleanup_stream_thumbnails(self, stream_id: str):
+    async def cleanup_stream_thumbnails(self, stream_id: str):
         """Remove all thumbnails for a stream (call when stream is removed)."""
         try:
-            # Remove from cache
-            if stream_id in self._cache:
-                del self._cache[stream_id]
+            # Stop the stream's batch worker; it cancels any pending requests
+            self._batch_queues.pop(stream_id, None)
+            worker = self._batch_workers.pop(stream_id, None)
+            if worker is not None:
+                worker.cancel()
+                await asyncio.gather(worker, return_exceptions=True)
             
-            # Remove registered thumbnails
-            if stream_id in self._thumbnail_registry:
-                for seq, (path, _) in self._thumbnail_registry[stream_id].items():
-                    try:
-                        file_path = Path(path)
-                        if file_path.exists():
-                            file_path.unlink()
-                    except:
-                        pass
-                del self._thumbnail_registry[stream_id]
+            # Drop in-memory state on the loop thread
+            self._cache.pop(stream_id, None)
+            registry = self._thumbnail_registry.pop(stream_id, ())
+            paths = [path for _, path, _ in registry]
             
-            # Also scan directory for any matching files
-            pattern = f"{stream_id}_*.jpg"
-            for thumb_file in self.thumbnails_dir.glob(pattern):
-                try:
-                    thumb_file.unlink()
-                except:
-                    pass
+            # File removal can touch thousands of files; keep it off the event loop
+            await asyncio.to_thread(self._blocking_cleanup, stream_id, paths)
             
             logger.info(f"Cleaned up all thumbnails for stream: {stream_id}")
         except Exception as e:
             logger.error(f"Error cleaning up thumbnails for {stream_id}: {e}")
     
+    def _blocking_cleanup(self, stream_id: str, paths: list):
+        """Unlink a stream's registered thumbnails and any stray files (runs in a thread)."""
+        # Remove registered thumbnails
+        for path in paths:
+            try:
+                Path(path).unlink(missing_ok=True)
+            except OSError:
+                pass
+        
+        # Also scan directory for any matching files
+        pattern = f"{stream_id}_*.jpg"
+        for thumb_file in self.thumbnails_dir.glob(pattern):
+            try:
+                thumb_file.unlink()
+            except OSError:
+                pass
+    
+    def _publish(self, work_path: str, output_path: str):
+        """
+        Atomically move a rendered thumbnail into the served directory (runs in a thread).
+        
+        tmpfs and the served directory are usually different filesystems, in
+        which case the file is copied next to its destination first so the
+        final os.replace is still atomic for readers.
+        """
+        try:
+            try:
+                os.replace(work_path, output_path)
+            except OSError:
+                staging_path = f"{output_path}.tmp"
+                shutil.copyfile(work_path, staging_path)
+                os.replace(staging_path, output_path)
+                os.unlink(work_path)
+        except Exception as e:
+            logger.error(f"Error publishing thumbnail {output_path}: {e}")
+    
     def get_thumbnail_url(self, stream_id: str, sequence: int) -> str:
         """Get the URL path for a thumbnail."""
         return f"/data/thumbnails/{stream_id}_{sequence}.jpg"
@@ -1,18 +1,36 @@
 import logging
-from typing import Dict, List, Optional
+import mmap
+import os
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
+import numpy as np
+from app.services.ts_kernel import (
+    HAS_NUMBA, NUM_PIDS, NUM_METRICS, analyze_ts_buffer,
+    PID_KIND_UNKNOWN, PID_KIND_PAT, PID_KIND_SCTE35, PID_KIND_OTHER,
+    M_SYNC_BYTE_ERRORS, M_TRANSPORT_ERRORS, M_CONTINUITY_ERRORS, M_PCR_COUNT,
+    M_PCR_DISCONTINUITIES, M_PAT_ERRORS, M_NULL_PACKETS, M_SCTE35_MESSAGES,
+    M_SCTE35_PID_COUNT,
+)
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+# Shared read-only pid_counts for metrics that never saw a packet, so building
+# an empty TSMetrics does not allocate a NUM_PIDS array
+_EMPTY_PID_COUNTS = np.zeros(0, dtype=np.int64)
+_EMPTY_PID_COUNTS.flags.writeable = False
+
+
+@dataclass(slots=True)
 class TSMetrics:
     """MPEG-TS analysis metrics following TR 101 290 standards."""
     packet_count: int = 0
     sync_byte_errors: int = 0
     continuity_errors: int = 0
     transport_errors: int = 0
-    pid_counts: Dict[int, int] = field(default_factory=dict)
+    pid_counts: np.ndarray = field(
+        default_factory=lambda: _EMPTY_PID_COUNTS
+    )  # packets per PID, indexed by the 13-bit PID (empty until analyzed)
     pcr_count: int = 0
     pcr_discontinuities: int = 0
     pat_errors: int = 0
@@ -26,14 +44,25 @@ class TSMetrics:
     # SCTE-35 markers detected
     scte35_pids: List[int] = field(default_factory=list)
     scte35_messages: int = 0
+    
+    @property
+    def pid_counts_dict(self) -> Dict[int, int]:
+        """PID -> packet count for the PIDs present in the segment."""
+        counts = self.pid_counts
+        return {int(pid): int(counts[pid]) for pid in np.flatnonzero(counts)}
 
 
-@dataclass 
-class ContinuityTracker:
-    """Track continuity counter state per PID."""
-    last_cc: int = -1
-    error_count: int = 0
-    packet_count: int = 0
+# SWAR constants: one byte lane per packet, 8 packets per uint64 word
+_SWAR_SYNC = np.uint64(0x4747474747474747)
+_SWAR_LOW7 = np.uint64(0x7F7F7F7F7F7F7F7F)
+_SWAR_HIGH = np.uint64(0x8080808080808080)
+_SWAR_ONES = np.uint64(0x0101010101010101)
+
+
+def _swar_popcount(words: np.ndarray) -> int:
+    """Count set lane bits in words whose only set bits are 0x80 per byte."""
+    # Move each lane bit to bit 0, then sum the 8 lanes into the top byte
+    return int((((words >> np.uint64(7)) * _SWAR_ONES) >> np.uint64(56)).sum())
 
 
 class TSAnalyzer:
@@ -48,6 +77,9 @@ class TSAnalyzer:
     Priority 2 Indicators:
     - Transport_error: TEI flag set
     - PCR_discontinuity_indicator_error
+    
+    CC, PCR and PID classification state carries over between segments,
+    so each monitored stream needs its own instance.
     """
     
     # Known PID types
@@ -60,272 +92,358 @@ class TSAnalyzer:
     SCTE35_STREAM_TYPE = 0x86
     
     def __init__(self):
-        # Per-PID continuity tracking: PID -> ContinuityTracker
-        self.cc_trackers: Dict[int, ContinuityTracker] = {}
+        # Per-PID continuity tracking, indexed by the 13-bit PID (-1 = unseen)
+        self.cc_last = np.full(NUM_PIDS, -1, dtype=np.int8)
+        self.cc_errors = np.zeros(NUM_PIDS, dtype=np.int32)
+        self.cc_packets = np.zeros(NUM_PIDS, dtype=np.int32)
         
         # PCR tracking
-        self.last_pcr: Dict[int, int] = {}  # PID -> last PCR value
-        self.last_pcr_packet: Dict[int, int] = {}  # PID -> packet number at last PCR
+        self.last_pcr = np.full(NUM_PIDS, -1, dtype=np.int64)  # PID -> last PCR value
+        self.last_pcr_packet = np.zeros(NUM_PIDS, dtype=np.int64)  # PID -> packet number at last PCR
+        
+        # PID classifier: section type learned from the first table_id seen
+        self.pid_kind = np.full(NUM_PIDS, PID_KIND_UNKNOWN, dtype=np.int8)
+        self.pid_kind[self.PID_PAT] = PID_KIND_PAT
     
     def reset(self):
         """Reset analyzer state for new stream."""
-        self.cc_trackers.clear()
-        self.last_pcr.clear()
-        self.last_pcr_packet.clear()
+        self.cc_last.fill(-1)
+        self.cc_errors.fill(0)
+        self.cc_packets.fill(0)
+        self.last_pcr.fill(-1)
+        self.last_pcr_packet.fill(0)
+        self.pid_kind.fill(PID_KIND_UNKNOWN)
+        self.pid_kind[self.PID_PAT] = PID_KIND_PAT
     
     def analyze_segment(self, file_path: str) -> TSMetrics:
         """
         Analyze an MPEG-TS segment file.
         
+        The file is memory-mapped and handed to _analyze_buffer without
+        copying it into a bytes object.
+        
         Args:
             file_path: Path to the .ts segment file
             
         Returns:
             TSMetrics with analysis results
         """
-        metrics = TSMetrics()
-        
         try:
             with open(file_path, 'rb') as f:
-                packet_num = 0
+                if os.fstat(f.fileno()).st_size < 188:
+                    return TSMetrics()
                 
-                while True:
-                    chunk = f.read(188)
-                    if len(chunk) < 188:
-                        break
-                    
-                    packet_num += 1
-                    metrics.packet_count += 1
-                    
-                    # 1. Sync Byte Check (Priority 1)
-                    if chunk[0] != 0x47:
-                        metrics.sync_byte_errors += 1
-                        continue
-                    
-                    # Parse TS Header (4 bytes)
-                    header = self._parse_header(chunk)
-                    
-                    # 2. Transport Error Indicator Check (Priority 1)
-                    if header['tei']:
-                        metrics.transport_errors += 1
-                    
-                    # Track PID statistics
-                    pid = header['pid']
-                    metrics.pid_counts[pid] = metrics.pid_counts.get(pid, 0) + 1
-                    
-                    # Handle null packets
-                    if pid == self.PID_NULL:
-                        metrics.null_packet_count += 1
-                        continue
-                    
-                    # 3. Continuity Counter Check (Priority 1)
-                    if header['has_payload']:
-                        cc_error = self._check_continuity(pid, header['cc'])
-                        if cc_error:
-                            metrics.continuity_errors += 1
-                    
-                    # 4. PAT Check (Priority 2)
-                    if pid == self.PID_PAT:
-                        if not self._validate_pat(chunk):
-                            metrics.pat_errors += 1
-                    
-                    # 5. Check for adaptation field with PCR
-                    if header['has_adaptation']:
-                        pcr_result = self._check_pcr(chunk, pid, packet_num)
-                        if pcr_result == 'pcr_found':
-                            metrics.pcr_count += 1
-                        elif pcr_result == 'pcr_discontinuity':
-                            metrics.pcr_count += 1
-                            metrics.pcr_discontinuities += 1
-                    
-                    # 6. Detect SCTE-35 PIDs
-                    if self._is_scte35_packet(chunk, pid):
-                        if pid not in metrics.scte35_pids:
-                            metrics.scte35_pids.append(pid)
-                        metrics.scte35_messages += 1
-                    
+                # Zero-copy view of the page cache; no per-packet allocations
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    try:
+                        return self._analyze_buffer(mm)
+                    except Exception as e:
+                        # Handled here so the traceback (and its views of mm)
+                        # is dropped before the mmap is closed
+                        logger.error(f"Error analyzing TS segment {file_path}: {e}")
+                        return TSMetrics()
+        
         except Exception as e:
             logger.error(f"Error analyzing TS segment {file_path}: {e}")
-        
-        return metrics
+            return TSMetrics()
     
-    def _parse_header(self, packet: bytes) -> Dict:
-        """Parse the 4-byte TS packet header."""
-        byte1 = packet[1]
-        byte2 = packet[2]
-        byte3 = packet[3]
-        
-        return {
-            'sync': packet[0],
-            'tei': bool(byte1 & 0x80),  # Transport Error Indicator
-            'pusi': bool(byte1 & 0x40),  # Payload Unit Start Indicator
-            'priority': bool(byte1 & 0x20),  # Transport Priority
-            'pid': ((byte1 & 0x1F) << 8) | byte2,  # 13-bit PID
-            'scrambling': (byte3 & 0xC0) >> 6,  # Scrambling control
-            'has_adaptation': bool(byte3 & 0x20),  # Adaptation field flag
-            'has_payload': bool(byte3 & 0x10),  # Payload flag
-            'cc': byte3 & 0x0F,  # 4-bit continuity counter
-        }
+    def analyze_segment_bytes(self, data: bytes) -> TSMetrics:
+        """
+        Analyze an MPEG-TS segment that is already in memory.
+        
+        Args:
+            data: Segment content (any buffer-protocol object)
+            
+        Returns:
+            TSMetrics with analysis results
+        """
+        try:
+            return self._analyze_buffer(data)
+        except Exception as e:
+            logger.error(f"Error analyzing TS segment buffer: {e}")
+            return TSMetrics()
     
-    def _check_continuity(self, pid: int, cc: int) -> bool:
+    def _analyze_buffer(self, data) -> TSMetrics:
         """
-        Check continuity counter for errors.
+        Analyze whole 188-byte packets of a buffer; trailing bytes are ignored.
         
-        Returns True if there's a continuity error.
+        Uses the numba kernel in ts_kernel when available; otherwise packets
+        are viewed as an (N, 188) uint8 array and decoded column-wise with
+        NumPy. Both paths share the per-PID continuity/PCR state.
         """
-        if pid not in self.cc_trackers:
-            self.cc_trackers[pid] = ContinuityTracker(last_cc=cc)
-            return False
+        metrics = TSMetrics()
+        
+        num_packets = len(data) // 188
+        metrics.packet_count = num_packets
+        if num_packets == 0:
+            return metrics
+        
+        buf = np.frombuffer(data, dtype=np.uint8, count=num_packets * 188)
+        if HAS_NUMBA:
+            self._analyze_kernel(buf, num_packets, metrics)
+        else:
+            self._analyze_numpy(buf, num_packets, metrics)
         
-        tracker = self.cc_trackers[pid]
-        tracker.packet_count += 1
+        return metrics
+    
+    def _analyze_kernel(self, buf: np.ndarray, num_packets: int, metrics: TSMetrics):
+        """Run the compiled single-pass kernel and pack its output into metrics."""
+        pid_hist = np.zeros(NUM_PIDS, dtype=np.int64)
+        metrics.pid_counts = pid_hist
+        scte35_pids = np.zeros(NUM_PIDS, dtype=np.int64)
+        out = np.zeros(NUM_METRICS, dtype=np.int64)
+        
+        analyze_ts_buffer(buf, num_packets, pid_hist, self.cc_last, self.cc_errors, self.cc_packets,
+                          self.last_pcr, self.last_pcr_packet, self.pid_kind, scte35_pids, out)
+        
+        metrics.sync_byte_errors = int(out[M_SYNC_BYTE_ERRORS])
+        metrics.transport_errors = int(out[M_TRANSPORT_ERRORS])
+        metrics.continuity_errors = int(out[M_CONTINUITY_ERRORS])
+        metrics.pcr_count = int(out[M_PCR_COUNT])
+        metrics.pcr_discontinuities = int(out[M_PCR_DISCONTINUITIES])
+        metrics.pat_errors = int(out[M_PAT_ERRORS])
+        metrics.null_packet_count = int(out[M_NULL_PACKETS])
+        metrics.scte35_messages = int(out[M_SCTE35_MESSAGES])
+        metrics.scte35_pids = [int(pid) for pid in scte35_pids[:out[M_SCTE35_PID_COUNT]]]
+    
+    def _analyze_numpy(self, buf: np.ndarray, num_packets: int, metrics: TSMetrics):
+        """Vectorized fallback used when numba is not installed."""
+        pkts = buf.reshape(-1, 188)
+        
+        # 1. Sync Byte Check + 2. Transport Error Indicator Check (Priority 1)
+        metrics.sync_byte_errors, metrics.transport_errors = self._scan_sync_tei(pkts)
+        
+        if metrics.sync_byte_errors == 0:
+            # Common case: every packet is usable, so work on column views
+            rows = np.arange(num_packets)
+            byte1 = pkts[:, 1]
+            byte2 = pkts[:, 2]
+            byte3 = pkts[:, 3]
+        else:
+            # Bad-sync packets are skipped entirely
+            rows = np.flatnonzero(pkts[:, 0] == 0x47)  # row of each good packet in pkts
+            byte1 = pkts[rows, 1]
+            byte2 = pkts[rows, 2]
+            byte3 = pkts[rows, 3]
         
-        expected_cc = (tracker.last_cc + 1) % 16
+        # Track PID statistics
+        pid = ((byte1 & 0x1F).astype(np.int64) << 8) | byte2
+        metrics.pid_counts = np.bincount(pid, minlength=NUM_PIDS)
         
-        if cc != expected_cc:
-            # Check for duplicate (same CC is allowed)
-            if cc != tracker.last_cc:
-                tracker.error_count += 1
-                tracker.last_cc = cc
-                return True
+        # Handle null packets
+        not_null = pid != self.PID_NULL
+        metrics.null_packet_count = int(len(pid) - np.count_nonzero(not_null))
         
-        tracker.last_cc = cc
-        return False
+        pusi = (byte1 & 0x40) != 0
+        has_adaptation = (byte3 & 0x20) != 0
+        has_payload = (byte3 & 0x10) != 0
+        
+        # 3. Continuity Counter Check (Priority 1)
+        cc_sel = not_null & has_payload
+        metrics.continuity_errors = self._check_continuity_batch(pid[cc_sel], byte3[cc_sel] & 0x0F)
+        
+        # 4. PAT Check (Priority 2)
+        pat_sel = not_null & (pid == self.PID_PAT) & pusi
+        if pat_sel.any():
+            table_ids = self._section_table_ids(pkts, rows[pat_sel], has_adaptation[pat_sel], 188)
+            metrics.pat_errors = int(np.count_nonzero(table_ids != 0x00))
+        
+        # 5. Check for adaptation field with PCR
+        pcr_sel = not_null & has_adaptation
+        if pcr_sel.any():
+            pcr_rows = rows[pcr_sel]
+            adaptation_length = pkts[pcr_rows, 4]
+            has_pcr = (adaptation_length >= 7) & ((pkts[pcr_rows, 5] & 0x10) != 0)
+            pcr_rows = pcr_rows[has_pcr]
+            metrics.pcr_count = int(len(pcr_rows))
+            metrics.pcr_discontinuities = self._check_pcr(
+                pkts, pcr_rows, pid[pcr_sel][has_pcr]
+            )
+        
+        # 6. Detect SCTE-35 PIDs
+        scte_sel = not_null & pusi
+        if scte_sel.any():
+            scte_pids = self._classify_scte35(pkts, rows[scte_sel], pid[scte_sel], has_adaptation[scte_sel])
+            metrics.scte35_messages = int(len(scte_pids))
+            if len(scte_pids):
+                # Keep first-seen order
+                uniq, first = np.unique(scte_pids, return_index=True)
+                metrics.scte35_pids = [int(p) for p in uniq[np.argsort(first)]]
     
-    def _validate_pat(self, packet: bytes) -> bool:
-        """Basic PAT validation."""
-        try:
-            # Check if PUSI is set (required for PAT)
-            if not (packet[1] & 0x40):
-                return True  # Not a start of PAT, ok
-            
-            # Find pointer field
-            adaptation_length = 0
-            if packet[3] & 0x20:  # Has adaptation field
-                adaptation_length = packet[4] + 1
-            
-            payload_start = 4 + adaptation_length
-            if payload_start >= 188:
-                return False
-            
-            pointer = packet[payload_start]
-            section_start = payload_start + 1 + pointer
-            
-            if section_start >= 188:
-                return False
+    def _classify_scte35(self, pkts: np.ndarray, rows: np.ndarray, pids: np.ndarray,
+                         has_adaptation: np.ndarray) -> np.ndarray:
+        """
+        Return the PIDs of PUSI packets carrying SCTE-35 sections.
+        
+        Only packets on PIDs not yet in pid_kind have their table_id read;
+        the first readable table_id classifies the PID, and from that
+        packet on (inclusive) the PID is counted or skipped by lookup.
+        """
+        kinds = self.pid_kind[pids]
+        is_scte = kinds == PID_KIND_SCTE35
+        
+        unknown = np.flatnonzero(kinds == PID_KIND_UNKNOWN)
+        if len(unknown):
+            table_ids = self._section_table_ids(pkts, rows[unknown], has_adaptation[unknown], 187)
+            readable = table_ids >= 0
+            classified = unknown[readable]
             
-            # Check table ID (should be 0x00 for PAT)
-            table_id = packet[section_start]
-            return table_id == 0x00
+            new_pids, first = np.unique(pids[classified], return_index=True)
+            new_kinds = np.where(table_ids[readable][first] == 0xFC, PID_KIND_SCTE35, PID_KIND_OTHER)
+            self.pid_kind[new_pids] = new_kinds
             
-        except Exception:
-            return False
+            # Packets at/after the classifying packet of a new SCTE-35 PID
+            first_pos = np.full(NUM_PIDS, len(pids), dtype=np.int64)
+            new_scte = new_kinds == PID_KIND_SCTE35
+            first_pos[new_pids[new_scte]] = classified[first][new_scte]
+            is_scte[unknown] = unknown >= first_pos[pids[unknown]]
+        
+        return pids[is_scte]
     
-    def _check_pcr(self, packet: bytes, pid: int, packet_num: int) -> str:
+    @staticmethod
+    def _scan_sync_tei(pkts: np.ndarray) -> Tuple[int, int]:
         """
-        Check for PCR in adaptation field.
+        Count sync byte errors and TEI flags with SWAR over 8-packet blocks.
+        
+        Bytes 0 and 1 of every packet are gathered into contiguous columns
+        and viewed as uint64 words, so each word test covers 8 packets
+        without a per-packet compare. TEI is only counted on packets with a
+        valid sync byte.
         
         Returns:
-            'no_pcr': No PCR found
-            'pcr_found': PCR found, no discontinuity
-            'pcr_discontinuity': PCR found with discontinuity
+            (sync_byte_errors, transport_errors)
         """
-        try:
-            if not (packet[3] & 0x20):  # No adaptation field
-                return 'no_pcr'
-            
-            adaptation_length = packet[4]
-            if adaptation_length < 1:
-                return 'no_pcr'
-            
-            adaptation_flags = packet[5]
-            
-            # Check PCR flag (bit 4)
-            if not (adaptation_flags & 0x10):
-                return 'no_pcr'
-            
-            # Extract PCR (6 bytes starting at packet[6])
-            if adaptation_length < 7:
-                return 'no_pcr'
-            
-            pcr_base = (
-                (packet[6] << 25) |
-                (packet[7] << 17) |
-                (packet[8] << 9) |
-                (packet[9] << 1) |
-                ((packet[10] & 0x80) >> 7)
-            )
-            
-            # Check for discontinuity
-            is_discontinuity = False
-            if pid in self.last_pcr:
-                last_pcr = self.last_pcr[pid]
-                last_packet = self.last_pcr_packet[pid]
-                
-                # PCR should increase by approximately 27MHz * segment_time
-                # Check for large jump (> 2 seconds) or backwards
-                pcr_diff = pcr_base - last_pcr
-                packet_diff = packet_num - last_packet
-                
-                # Expected PCR increment per packet (roughly)
-                # At 27MHz, 188 bytes, typical bitrate
-                if pcr_diff < 0 or pcr_diff > 27000000 * 2:  # > 2 seconds
-                    is_discontinuity = True
-            
-            self.last_pcr[pid] = pcr_base
-            self.last_pcr_packet[pid] = packet_num
-            
-            return 'pcr_discontinuity' if is_discontinuity else 'pcr_found'
-            
-        except Exception:
-            return 'no_pcr'
+        num_packets = len(pkts)
+        lanes = -(-num_packets // 8) * 8
+        
+        # Pad to whole words with a good sync byte and a clear TEI bit
+        cols = np.empty((2, lanes), dtype=np.uint8)
+        cols[0, :num_packets] = pkts[:, 0]
+        cols[0, num_packets:] = 0x47
+        cols[1, :num_packets] = pkts[:, 1]
+        cols[1, num_packets:] = 0x00
+        sync_words, flag_words = cols.view(np.uint64)
+        
+        # High bit set in every byte lane that differs from 0x47
+        diff = sync_words ^ _SWAR_SYNC
+        bad_sync = (((diff & _SWAR_LOW7) + _SWAR_LOW7) | diff) & _SWAR_HIGH
+        tei = flag_words & _SWAR_HIGH & ~bad_sync
+        
+        return _swar_popcount(bad_sync), _swar_popcount(tei)
     
-    def _is_scte35_packet(self, packet: bytes, pid: int) -> bool:
+    def _check_continuity_batch(self, pids: np.ndarray, ccs: np.ndarray) -> int:
         """
-        Basic SCTE-35 detection.
+        Check continuity counters for a segment's payload packets.
         
-        SCTE-35 messages have specific patterns in payload.
+        Equivalent to ts_kernel._check_continuity per packet in stream order:
+        a packet is an error unless its CC equals the previous CC on the PID
+        (duplicate) or the previous CC + 1 (mod 16).
+        
+        Returns the number of continuity errors.
         """
-        try:
-            # SCTE-35 packets start with specific table IDs
-            # Check for splice_info_section (table_id = 0xFC)
-            
-            if not (packet[1] & 0x40):  # Not a start
-                return False
-            
-            adaptation_length = 0
-            if packet[3] & 0x20:
-                adaptation_length = packet[4] + 1
-            
-            payload_start = 4 + adaptation_length
-            if payload_start >= 187:
-                return False
-            
-            pointer = packet[payload_start]
-            section_start = payload_start + 1 + pointer
-            
-            if section_start >= 187:
-                return False
-            
-            table_id = packet[section_start]
-            
-            # SCTE-35 table IDs
-            return table_id == 0xFC
-            
-        except Exception:
-            return False
+        if len(pids) == 0:
+            return 0
+        
+        order = np.argsort(pids, kind='stable')
+        sorted_pids = pids[order]
+        sorted_cc = ccs[order].astype(np.int16)
+        
+        starts = np.flatnonzero(np.r_[True, sorted_pids[1:] != sorted_pids[:-1]])
+        ends = np.r_[starts[1:], len(sorted_pids)]
+        
+        group_pids = sorted_pids[starts]
+        
+        # Previous CC for every packet; group heads take the carried-over state
+        prev_cc = np.empty_like(sorted_cc)
+        prev_cc[1:] = sorted_cc[:-1]
+        prev_cc[starts] = self.cc_last[group_pids]
+        
+        errors = (prev_cc >= 0) & (((sorted_cc - prev_cc) & 0x0F) > 1)
+        
+        # First packet on an unseen PID only initialises the state
+        self.cc_packets[group_pids] += (ends - starts) - (self.cc_last[group_pids] < 0)
+        self.cc_errors[group_pids] += np.add.reduceat(errors.astype(np.int32), starts)
+        self.cc_last[group_pids] = sorted_cc[ends - 1]
+        
+        return int(errors.sum())
+    
+    def _check_pcr(self, pkts: np.ndarray, pcr_rows: np.ndarray, pids: np.ndarray) -> int:
+        """
+        Extract PCR bases for PCR-bearing packets and count discontinuities.
+        
+        A discontinuity is a PCR going backwards or jumping by more than
+        2 seconds relative to the previous PCR on the same PID.
+        
+        Returns the number of PCR discontinuities.
+        """
+        if len(pcr_rows) == 0:
+            return 0
+        
+        fields = pkts[pcr_rows, 6:11].astype(np.int64)
+        pcr_base = (
+            (fields[:, 0] << 25) |
+            (fields[:, 1] << 17) |
+            (fields[:, 2] << 9) |
+            (fields[:, 3] << 1) |
+            ((fields[:, 4] & 0x80) >> 7)
+        )
+        
+        order = np.argsort(pids, kind='stable')
+        sorted_pids = pids[order]
+        sorted_pcr = pcr_base[order]
+        sorted_rows = pcr_rows[order]
+        
+        starts = np.flatnonzero(np.r_[True, sorted_pids[1:] != sorted_pids[:-1]])
+        ends = np.r_[starts[1:], len(sorted_pids)]
+        
+        group_pids = sorted_pids[starts]
+        
+        # Consecutive PCR deltas; each PID's first delta is against its carried-over PCR
+        pcr_diff = np.diff(sorted_pcr, prepend=0)
+        pcr_diff[starts] = sorted_pcr[starts] - self.last_pcr[group_pids]
+        has_prev = np.ones(len(sorted_pcr), dtype=bool)
+        has_prev[starts] = self.last_pcr[group_pids] >= 0
+        
+        # PCR should increase by approximately 27MHz * segment_time
+        # Check for large jump (> 2 seconds) or backwards
+        discontinuities = has_prev & ((pcr_diff < 0) | (pcr_diff > 27000000 * 2))
+        
+        self.last_pcr[group_pids] = sorted_pcr[ends - 1]
+        self.last_pcr_packet[group_pids] = sorted_rows[ends - 1] + 1
+        
+        return int(discontinuities.sum())
+    
+    @staticmethod
+    def _section_table_ids(pkts: np.ndarray, rows: np.ndarray, has_adaptation: np.ndarray,
+                           limit: int) -> np.ndarray:
+        """
+        Locate the PSI section start of PUSI packets and return its table_id.
+        
+        Packets whose pointer field or section start falls at/after limit
+        get -1.
+        """
+        adaptation_length = np.where(has_adaptation, pkts[rows, 4].astype(np.int64) + 1, 0)
+        payload_start = 4 + adaptation_length
+        valid = payload_start < limit
+        
+        pointer = np.zeros(len(rows), dtype=np.int64)
+        pointer[valid] = pkts[rows[valid], payload_start[valid]]
+        section_start = payload_start + 1 + pointer
+        valid &= section_start < limit
+        
+        table_ids = np.full(len(rows), -1, dtype=np.int64)
+        table_ids[valid] = pkts[rows[valid], section_start[valid]]
+        return table_ids
     
     def get_continuity_summary(self) -> Dict[int, Dict]:
         """Get summary of continuity errors per PID."""
         summary = {}
-        for pid, tracker in self.cc_trackers.items():
-            summary[pid] = {
-                'packets': tracker.packet_count,
-                'errors': tracker.error_count,
-                'error_rate': tracker.error_count / max(tracker.packet_count, 1) * 100
+        for pid in np.flatnonzero(self.cc_last >= 0):
+            packets = int(self.cc_packets[pid])
+            errors = int(self.cc_errors[pid])
+            summary[int(pid)] = {
+                'packets': packets,
+                'errors': errors,
+                'error_rate': errors / max(packets, 1) * 100
             }
         return summary
-
-
-# Global instance
-ts_analyzer = TSAnalyzer()
@@ -0,0 +1,183 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # pragma: no cover - numba is an optional accelerator
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in so the kernel stays importable without numba."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+PACKET_SIZE = 188
+NUM_PIDS = 8192
+PID_PAT = 0x0000
+PID_NULL = 0x1FFF
+
+# PID classifier values (pid_kind array)
+PID_KIND_UNKNOWN = 0
+PID_KIND_PAT = 1
+PID_KIND_SCTE35 = 2
+PID_KIND_OTHER = 3
+
+# Slots of the metrics output array
+M_SYNC_BYTE_ERRORS = 0
+M_TRANSPORT_ERRORS = 1
+M_CONTINUITY_ERRORS = 2
+M_PCR_COUNT = 3
+M_PCR_DISCONTINUITIES = 4
+M_PAT_ERRORS = 5
+M_NULL_PACKETS = 6
+M_SCTE35_MESSAGES = 7
+M_SCTE35_PID_COUNT = 8
+NUM_METRICS = 16
+
+
+@njit(cache=True, boundscheck=False)
+def _section_table_id(buf, off, has_adaptation, limit):
+    """Return the table_id of a PUSI packet's first section, or -1."""
+    payload_start = 4
+    if has_adaptation:
+        payload_start += np.int64(buf[off + 4]) + 1
+    if payload_start >= limit:
+        return -1
+
+    section_start = payload_start + 1 + np.int64(buf[off + payload_start])
+    if section_start >= limit:
+        return -1
+
+    return np.int64(buf[off + section_start])
+
+
+@njit(cache=True, boundscheck=False)
+def _check_continuity(pid, cc, cc_last, cc_errors, cc_packets):
+    """Update CC state for one payload packet; True on a CC error."""
+    last = np.int64(cc_last[pid])
+    cc_last[pid] = cc
+    if last < 0:
+        return False
+
+    cc_packets[pid] += 1
+    if cc != ((last + 1) & 0x0F) and cc != last:
+        cc_errors[pid] += 1
+        return True
+    return False
+
+
+@njit(cache=True, boundscheck=False)
+def _check_pcr(buf, off, pid, packet_num, last_pcr, last_pcr_packet):
+    """
+    Check a packet's adaptation field for a PCR.
+
+    Returns 0 (no PCR), 1 (PCR found) or 2 (PCR discontinuity).
+    """
+    adaptation_length = np.int64(buf[off + 4])
+    if adaptation_length < 7 or not (buf[off + 5] & 0x10):
+        return 0
+
+    pcr_base = (
+        (np.int64(buf[off + 6]) << 25) |
+        (np.int64(buf[off + 7]) << 17) |
+        (np.int64(buf[off + 8]) << 9) |
+        (np.int64(buf[off + 9]) << 1) |
+        ((np.int64(buf[off + 10]) & 0x80) >> 7)
+    )
+
+    result = 1
+    last = last_pcr[pid]
+    if last >= 0:
+        pcr_diff = pcr_base - last
+        if pcr_diff < 0 or pcr_diff > 27000000 * 2:  # > 2 seconds
+            result = 2
+
+    last_pcr[pid] = pcr_base
+    last_pcr_packet[pid] = packet_num
+    return result
+
+
+@njit(cache=True, boundscheck=False)
+def analyze_ts_buffer(buf, num_packets, pid_hist, cc_last, cc_errors, cc_packets,
+                      last_pcr, last_pcr_packet, pid_kind, scte35_pids, metrics):
+    """
+    Walk num_packets TS packets of buf in a single pass.
+
+    All outputs are preallocated arrays indexed by PID (length NUM_PIDS):
+    pid_hist accumulates packet counts, cc_last/cc_errors/cc_packets and
+    last_pcr/last_pcr_packet carry per-PID state across calls (-1 = unseen).
+    pid_kind caches the section type of each PID once its first table_id
+    has been read, so SCTE-35 detection only parses unclassified PIDs.
+    SCTE-35 PIDs are appended to scte35_pids in first-seen order and the
+    counters land in metrics at the M_* slots.
+    """
+    for i in range(num_packets):
+        off = i * PACKET_SIZE
+
+        # 1. Sync Byte Check (Priority 1)
+        if buf[off] != 0x47:
+            metrics[M_SYNC_BYTE_ERRORS] += 1
+            continue
+
+        byte1 = np.int64(buf[off + 1])
+        byte3 = np.int64(buf[off + 3])
+
+        # 2. Transport Error Indicator Check (Priority 1)
+        if byte1 & 0x80:
+            metrics[M_TRANSPORT_ERRORS] += 1
+
+        pid = ((byte1 & 0x1F) << 8) | np.int64(buf[off + 2])
+        pid_hist[pid] += 1
+
+        if pid == PID_NULL:
+            metrics[M_NULL_PACKETS] += 1
+            continue
+
+        pusi = (byte1 & 0x40) != 0
+        has_adaptation = (byte3 & 0x20) != 0
+
+        # 3. Continuity Counter Check (Priority 1)
+        if byte3 & 0x10:
+            if _check_continuity(pid, byte3 & 0x0F, cc_last, cc_errors, cc_packets):
+                metrics[M_CONTINUITY_ERRORS] += 1
+
+        # 4. PAT Check (Priority 2)
+        if pid == PID_PAT and pusi:
+            if _section_table_id(buf, off, has_adaptation, PACKET_SIZE) != 0x00:
+                metrics[M_PAT_ERRORS] += 1
+
+        # 5. Check for adaptation field with PCR
+        if has_adaptation:
+            pcr_result = _check_pcr(buf, off, pid, i + 1, last_pcr, last_pcr_packet)
+            if pcr_result > 0:
+                metrics[M_PCR_COUNT] += 1
+                if pcr_result == 2:
+                    metrics[M_PCR_DISCONTINUITIES] += 1
+
+        # 6. Detect SCTE-35 PIDs
+        if not pusi:
+            continue
+        kind = pid_kind[pid]
+        if kind == PID_KIND_UNKNOWN:
+            table_id = _section_table_id(buf, off, has_adaptation, PACKET_SIZE - 1)
+            if table_id == 0xFC:
+                kind = PID_KIND_SCTE35
+            elif table_id >= 0:
+                kind = PID_KIND_OTHER
+            pid_kind[pid] = kind
+        if kind == PID_KIND_SCTE35:
+            metrics[M_SCTE35_MESSAGES] += 1
+            count = metrics[M_SCTE35_PID_COUNT]
+            seen = False
+            for j in range(count):
+                if scte35_pids[j] == pid:
+                    seen = True
+                    break
+            if not seen:
+                scte35_pids[count] = pid
+                metrics[M_SCTE35_PID_COUNT] = count + 1
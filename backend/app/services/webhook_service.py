@@ -1,17 +1,25 @@
 """Webhook service for sending HTTP notifications on alerts."""
 import aiohttp
 import asyncio
+import yarl
 import logging
-import json
+import os
+import orjson
+from app.services.serialization import dumps
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set
+from collections import defaultdict
+from itertools import chain
 from pathlib import Path
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from enum import Enum
 
 logger = logging.getLogger(__name__)
 
 WEBHOOKS_FILE = Path("data/webhooks.json")
+SAVE_DEBOUNCE = 2.0  # seconds to coalesce config edits into one write
+MAX_CONCURRENT_SENDS = 64  # in-flight webhook requests across all events
+DEFAULT_EVENTS = ("alert_raised", "alert_resolved", "stream_down", "stream_up")
 
 
 @dataclass
@@ -27,61 +35,224 @@ class WebhookConfig:
     
     def __post_init__(self):
         if self.events is None:
-            self.events = ["alert_raised", "alert_resolved", "stream_down", "stream_up"]
+            self.events = list(DEFAULT_EVENTS)
         if self.headers is None:
             self.headers = {}
         if self.created_at is None:
             self.created_at = datetime.utcnow().isoformat()
 
 
+# Fields update_webhook may set
+_ALLOWED_FIELDS = frozenset(f.name for f in fields(WebhookConfig))
+
+
+def _wh_to_dict(webhook: WebhookConfig) -> Dict[str, Any]:
+    """Flatten a WebhookConfig for persistence (cheaper than dataclasses.asdict)."""
+    return {
+        "id": webhook.id,
+        "name": webhook.name,
+        "url": webhook.url,
+        "enabled": webhook.enabled,
+        "events": webhook.events,
+        "headers": webhook.headers,
+        "created_at": webhook.created_at
+    }
+
+
+def _wh_from_dict(record: Dict[str, Any]) -> WebhookConfig:
+    """
+    Rebuild a WebhookConfig from a persisted record.
+    
+    Fills the instance dict directly instead of going through __init__ and
+    __post_init__; defaults are applied inline for records that predate a
+    field.
+    """
+    events = record.get("events")
+    webhook = WebhookConfig.__new__(WebhookConfig)
+    webhook.__dict__.update({
+        "id": record["id"],
+        "name": record["name"],
+        "url": record["url"],
+        "enabled": record.get("enabled", True),
+        # An empty list is meaningful (all events), so only default a missing one
+        "events": list(DEFAULT_EVENTS) if events is None else events,
+        "headers": record.get("headers") or {},
+        "created_at": record.get("created_at") or datetime.utcnow().isoformat()
+    })
+    return webhook
+
+
 class WebhookService:
     """Service for managing and sending webhooks."""
     
     def __init__(self):
         self.webhooks: Dict[str, WebhookConfig] = {}
+        # event_type -> ids of webhooks subscribed to it
+        self._by_event: Dict[str, Set[str]] = defaultdict(set)
+        # ids of webhooks with an empty event list, which receive everything
+        self._all_events: Set[str] = set()
+        # webhook id -> request headers with Content-Type merged in
+        self._merged_headers: Dict[str, Dict[str, str]] = {}
+        # webhook id -> parsed URL, so aiohttp does not re-parse it per send.
+        # Filled on first delivery so an unparsable URL only fails that send.
+        self._urls: Dict[str, yarl.URL] = {}
         self.session: Optional[aiohttp.ClientSession] = None
-        self._load_webhooks()
+        self._send_sem: Optional[asyncio.Semaphore] = None
+        self._dirty = False
+        self._save_task: Optional[asyncio.Task] = None
+        self._flush_now = asyncio.Event()  # set by stop() to skip the debounce wait
     
-    def _load_webhooks(self):
-        """Load webhooks from file."""
+    def _load_webhooks_sync(self) -> List[WebhookConfig]:
+        """Read webhooks from file. Runs in a worker thread."""
+        configs = []
         try:
             if WEBHOOKS_FILE.exists():
-                with open(WEBHOOKS_FILE, 'r') as f:
-                    data = json.load(f)
+                with open(WEBHOOKS_FILE, 'rb') as f:
+                    data = orjson.loads(f.read())
                     for wh in data.get("webhooks", []):
-                        config = WebhookConfig(**wh)
-                        self.webhooks[config.id] = config
-                logger.info(f"Loaded {len(self.webhooks)} webhooks from persistence")
+                        configs.append(_wh_from_dict(wh))
         except Exception as e:
             logger.error(f"Error loading webhooks: {e}")
+        return configs
+    
+    async def _load_webhooks(self):
+        """Load webhooks from file without blocking the event loop."""
+        configs = await asyncio.to_thread(self._load_webhooks_sync)
+        for config in configs:
+            self._register(config)
+        if configs:
+            logger.info(f"Loaded {len(configs)} webhooks from persistence")
     
-    def _save_webhooks(self):
-        """Save webhooks to file."""
+    def _save_webhooks_sync(self, records: List[Dict[str, Any]]):
+        """
+        Write webhook records to file. Safe to run in a worker thread.
+        
+        Writes a temp file and renames it over the old one so a crash
+        mid-write never leaves a truncated config behind.
+        """
         try:
             WEBHOOKS_FILE.parent.mkdir(parents=True, exist_ok=True)
-            data = {"webhooks": [asdict(wh) for wh in self.webhooks.values()]}
-            with open(WEBHOOKS_FILE, 'w') as f:
-                json.dump(data, f, indent=2)
+            data = {"webhooks": records}
+            tmp_path = WEBHOOKS_FILE.with_suffix(".json.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            os.replace(tmp_path, WEBHOOKS_FILE)
         except Exception as e:
             logger.error(f"Error saving webhooks: {e}")
     
+    async def _save_webhooks(self):
+        """Save webhooks to file without blocking the event loop."""
+        # Snapshot on the loop thread so the writer never sees a dict mid-update
+        records = [_wh_to_dict(wh) for wh in self.webhooks.values()]
+        await asyncio.to_thread(self._save_webhooks_sync, records)
+    
+    def _register(self, config: WebhookConfig):
+        """Store a webhook and index it by the events it subscribes to."""
+        self.webhooks[config.id] = config
+        self._index_events(config)
+        self._merge_headers(config)
+        self._urls.pop(config.id, None)
+    
+    def _unregister(self, webhook_id: str):
+        """Drop a webhook and its index entries."""
+        del self.webhooks[webhook_id]
+        self._unindex_events(webhook_id)
+        self._merged_headers.pop(webhook_id, None)
+        self._urls.pop(webhook_id, None)
+    
+    def _merge_headers(self, config: WebhookConfig):
+        """Cache the full header set sent with every request to a webhook."""
+        self._merged_headers[config.id] = {
+            "Content-Type": "application/json",
+            **(config.headers or {})
+        }
+    
+    def _index_events(self, config: WebhookConfig):
+        """Add a webhook to the event index."""
+        if config.events:
+            for event_type in config.events:
+                self._by_event[event_type].add(config.id)
+        else:
+            self._all_events.add(config.id)
+    
+    def _unindex_events(self, webhook_id: str):
+        """Remove a webhook from the event index."""
+        for event_type in [e for e, ids in self._by_event.items() if webhook_id in ids]:
+            ids = self._by_event[event_type]
+            ids.discard(webhook_id)
+            if not ids:
+                del self._by_event[event_type]
+        self._all_events.discard(webhook_id)
+    
+    def _schedule_save(self):
+        """Mark the config dirty and schedule a debounced save."""
+        self._dirty = True
+        if self._save_task is not None and not self._save_task.done():
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (e.g. scripts): write through
+            self._dirty = False
+            self._save_webhooks_sync([_wh_to_dict(wh) for wh in self.webhooks.values()])
+            return
+        
+        self._save_task = loop.create_task(self._delayed_save(SAVE_DEBOUNCE))
+    
+    async def _delayed_save(self, delay: float):
+        """
+        Write the config once edits have settled, off the event loop.
+        
+        Loops until no edit arrived during the previous write, since
+        _schedule_save does not start a second task while this one runs.
+        """
+        while self._dirty:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty = False
+            await self._save_webhooks()
+    
     async def start(self):
         """Initialize the webhook service."""
+        await self._load_webhooks()
+        self._send_sem = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
+        # Keep-alive pooling and DNS caching avoid per-event connection setup
+        connector = aiohttp.TCPConnector(
+            limit=128,
+            limit_per_host=16,
+            ttl_dns_cache=300,
+            keepalive_timeout=30
+        )
         self.session = aiohttp.ClientSession(
+            connector=connector,
             timeout=aiohttp.ClientTimeout(total=10)
         )
         logger.info("WebhookService started")
     
     async def stop(self):
         """Cleanup the webhook service."""
+        # Flush any pending config edits
+        # Let a pending save finish now rather than cancelling it mid-write
+        if self._save_task is not None and not self._save_task.done():
+            self._flush_now.set()
+            await self._save_task
+        if self._dirty:
+            self._dirty = False
+            await self._save_webhooks()
+        
         if self.session:
             await self.session.close()
         logger.info("WebhookService stopped")
     
     def add_webhook(self, config: WebhookConfig) -> WebhookConfig:
         """Add a new webhook configuration."""
-        self.webhooks[config.id] = config
-        self._save_webhooks()
+        if config.id in self.webhooks:
+            self._unindex_events(config.id)
+        self._register(config)
+        self._schedule_save()
         logger.info(f"Added webhook: {config.name} ({config.url})")
         return config
     
@@ -92,17 +263,25 @@ class WebhookService:
         
         current = self.webhooks[webhook_id]
         for key, value in updates.items():
-            if hasattr(current, key):
+            if key in _ALLOWED_FIELDS:
                 setattr(current, key, value)
         
-        self._save_webhooks()
+        if "events" in updates:
+            self._unindex_events(webhook_id)
+            self._index_events(current)
+        if "headers" in updates:
+            self._merge_headers(current)
+        if "url" in updates:
+            self._urls.pop(webhook_id, None)
+        
+        self._schedule_save()
         return current
     
     def delete_webhook(self, webhook_id: str) -> bool:
         """Delete a webhook configuration."""
         if webhook_id in self.webhooks:
-            del self.webhooks[webhook_id]
-            self._save_webhooks()
+            self._unregister(webhook_id)
+            self._schedule_save()
             logger.info(f"Deleted webhook: {webhook_id}")
             return True
         return False
@@ -121,48 +300,58 @@ class WebhookService:
             logger.warning("WebhookService not started, cannot send events")
             return
         
-        tasks = []
-        for webhook in self.webhooks.values():
-            if not webhook.enabled:
-                continue
-            
-            # Check if this webhook should receive this event type
-            if webhook.events and event_type not in webhook.events:
-                continue
-            
-            tasks.append(self._send_to_webhook(webhook, event_type, payload))
+        webhook_ids = chain(self._by_event.get(event_type, ()), self._all_events)
+        webhooks = [
+            webhook for webhook in map(self.webhooks.__getitem__, webhook_ids)
+            if webhook.enabled
+        ]
+        if not webhooks:
+            return
         
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
-    
-    async def _send_to_webhook(self, webhook: WebhookConfig, event_type: str, payload: Dict[str, Any]):
-        """Send payload to a single webhook."""
+        # Every subscriber gets identical bytes, so encode once
         try:
-            data = {
-                "event_type": event_type,
-                "timestamp": datetime.utcnow().isoformat(),
-                "payload": payload
-            }
-            
-            headers = {
-                "Content-Type": "application/json",
-                **webhook.headers
-            }
-            
-            async with self.session.post(
-                webhook.url,
-                json=data,
-                headers=headers
-            ) as response:
-                if response.status >= 400:
-                    logger.warning(f"Webhook {webhook.name} returned {response.status}")
-                else:
-                    logger.debug(f"Webhook {webhook.name} delivered successfully")
-                    
-        except asyncio.TimeoutError:
-            logger.warning(f"Webhook {webhook.name} timed out")
+            body = self._encode_event(event_type, payload)
         except Exception as e:
-            logger.error(f"Error sending to webhook {webhook.name}: {e}")
+            logger.error(f"Error encoding webhook event {event_type}: {e}")
+            return
+        
+        await asyncio.gather(
+            *(self._send_to_webhook(webhook, body) for webhook in webhooks),
+            return_exceptions=True
+        )
+    
+    @staticmethod
+    def _encode_event(event_type: str, payload: Dict[str, Any]) -> bytes:
+        """Build and serialize the JSON body posted to webhooks."""
+        data = {
+            "event_type": event_type,
+            "timestamp": datetime.utcnow().isoformat(),
+            "payload": payload
+        }
+        return dumps(data)
+    
+    async def _send_to_webhook(self, webhook: WebhookConfig, body: bytes):
+        """Send a pre-serialized event body to a single webhook."""
+        async with self._send_sem:
+            try:
+                url = self._urls.get(webhook.id)
+                if url is None:
+                    url = self._urls[webhook.id] = yarl.URL(webhook.url)
+                
+                async with self.session.post(
+                    url,
+                    data=body,
+                    headers=self._merged_headers[webhook.id]
+                ) as response:
+                    if response.status >= 400:
+                        logger.warning(f"Webhook {webhook.name} returned {response.status}")
+                    else:
+                        logger.debug(f"Webhook {webhook.name} delivered successfully")
+                    
+            except asyncio.TimeoutError:
+                logger.warning(f"Webhook {webhook.name} timed out")
+            except Exception as e:
+                logger.error(f"Error sending to webhook {webhook.name}: {e}")
     
     async def send_alert(self, alert_data: Dict[str, Any]):
         """Send an alert event to webhooks."""
@@ -1,37 +1,103 @@
 import asyncio
 import logging
-from typing import Dict, Set
+import time
+from typing import Dict, Iterable, Mapping, Tuple
 from fastapi import WebSocket
-from datetime import datetime
-import json
+from datetime import datetime, timezone
+from app.services.serialization import dumps
 
 logger = logging.getLogger(__name__)
 
+# Outbound messages buffered per connection before it is dropped as too slow
+SEND_QUEUE_SIZE = 256
+# Seconds a client may sit on a full queue without sending anything before it is dropped
+SLOW_CLIENT_TIMEOUT = 5.0
+
+
+def _dumps(message: dict) -> str:
+    """
+    Serialize a WebSocket message.
+    
+    Returns text because the dashboard parses frames with JSON.parse, which
+    only works on text frames; orjson's output is already UTF-8 so the decode
+    is a plain copy.
+    """
+    return dumps(message).decode()
+
 
 class WebSocketManager:
     def __init__(self):
-        # stream_id -> set of WebSocket connections
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        # stream_id -> {WebSocket: outbound queue drained by its writer task}.
+        # Each per-stream mapping is copy-on-write: it is never mutated after
+        # being published, only replaced under _lock, so broadcasts can read a
+        # snapshot without locking.
+        self.active_connections: Dict[str, Mapping[WebSocket, asyncio.Queue]] = {}
+        self._writers: Dict[WebSocket, asyncio.Task] = {}
+        # Messages each writer has sent, and (sent count, time) when its queue
+        # overflowed without progress since; see broadcast_prepared
+        self._sent: Dict[WebSocket, int] = {}
+        self._overflow_mark: Dict[WebSocket, Tuple[int, float]] = {}
         self._lock = asyncio.Lock()
     
     async def connect(self, websocket: WebSocket, stream_id: str):
         """Accept and register a WebSocket connection for a stream."""
         await websocket.accept()
+        queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
         async with self._lock:
-            if stream_id not in self.active_connections:
-                self.active_connections[stream_id] = set()
-            self.active_connections[stream_id].add(websocket)
+            connections = dict(self.active_connections.get(stream_id, {}))
+            connections[websocket] = queue
+            self.active_connections[stream_id] = connections
+            self._sent[websocket] = 0
+            self._writers[websocket] = asyncio.create_task(
+                self._writer(websocket, stream_id, queue)
+            )
         logger.info(f"WebSocket connected to stream {stream_id}. Total: {len(self.active_connections[stream_id])}")
     
     async def disconnect(self, websocket: WebSocket, stream_id: str):
         """Remove a WebSocket connection."""
         async with self._lock:
-            if stream_id in self.active_connections:
-                self.active_connections[stream_id].discard(websocket)
-                if not self.active_connections[stream_id]:
-                    del self.active_connections[stream_id]
+            self._remove(stream_id, (websocket,))
         logger.info(f"WebSocket disconnected from stream {stream_id}")
     
+    def _remove(self, stream_id: str, websockets: Iterable[WebSocket]):
+        """Unregister connections and stop their writers. Caller holds _lock."""
+        removed = set(websockets)
+        current = asyncio.current_task()
+        for websocket in removed:
+            self._sent.pop(websocket, None)
+            self._overflow_mark.pop(websocket, None)
+            writer = self._writers.pop(websocket, None)
+            if writer is not None and writer is not current:
+                writer.cancel()
+        
+        connections = self.active_connections.get(stream_id)
+        if connections is None:
+            return
+        # Repeat disconnects (writer failure, then the endpoint) are common;
+        # leave the published mapping alone when there is nothing to remove
+        present = removed.intersection(connections)
+        if not present:
+            return
+        if len(present) == len(connections):
+            del self.active_connections[stream_id]
+        else:
+            remaining = dict(connections)
+            for websocket in present:
+                del remaining[websocket]
+            self.active_connections[stream_id] = remaining
+    
+    async def _writer(self, websocket: WebSocket, stream_id: str, queue: asyncio.Queue):
+        """Drain a connection's outbound queue so slow clients only stall themselves."""
+        while True:
+            payload = await queue.get()
+            try:
+                await websocket.send_text(payload)
+            except Exception as e:
+                logger.error(f"Error sending to WebSocket: {e}")
+                await self.disconnect(websocket, stream_id)
+                return
+            self._sent[websocket] += 1
+    
     async def broadcast(self, stream_id: str, message: dict):
         """Broadcast a message to all connections for a stream."""
         if stream_id not in self.active_connections:
@@ -39,31 +105,55 @@ class WebSocketManager:
         
         # Add timestamp if not present
         if "timestamp" not in message:
-            message["timestamp"] = datetime.utcnow().isoformat()
+            message["timestamp"] = datetime.now(timezone.utc).isoformat()
+        
+        await self.broadcast_prepared(stream_id, _dumps(message))
+    
+    async def broadcast_prepared(self, stream_id: str, payload: str):
+        """
+        Broadcast an already-serialized message to all connections for a stream.
         
-        message_str = json.dumps(message, default=str)
+        Lets callers that fan the same message out to several streams
+        serialize it once and reuse the payload. Messages are queued for each
+        connection's writer task, so this never waits on the network.
+        """
+        # Copy-on-write snapshot, safe to iterate without the lock
+        connections = self.active_connections.get(stream_id)
+        if not connections:
+            return
         
-        disconnected = set()
-        for connection in self.active_connections[stream_id]:
+        slow_clients = []
+        for connection, queue in connections.items():
             try:
-                await connection.send_text(message_str)
-            except Exception as e:
-                logger.error(f"Error sending to WebSocket: {e}")
-                disconnected.add(connection)
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # A full queue alone may just mean the writer has not been
+                # scheduled yet. Skip this message for the client and drop it
+                # only once its writer has sent nothing for SLOW_CLIENT_TIMEOUT.
+                sent = self._sent.get(connection, 0)
+                mark = self._overflow_mark.get(connection)
+                now = time.monotonic()
+                if mark is None or mark[0] != sent:
+                    self._overflow_mark[connection] = (sent, now)
+                elif now - mark[1] >= SLOW_CLIENT_TIMEOUT:
+                    slow_clients.append(connection)
         
-        # Clean up disconnected clients
-        if disconnected:
+        # Drop clients that cannot keep up rather than buffering without bound
+        if slow_clients:
+            logger.warning(f"Dropping {len(slow_clients)} slow WebSocket client(s) on stream {stream_id}")
             async with self._lock:
-                self.active_connections[stream_id] -= disconnected
-                if not self.active_connections[stream_id]:
-                    del self.active_connections[stream_id]
+                self._remove(stream_id, slow_clients)
+            await asyncio.gather(
+                *(ws.close(code=1011) for ws in slow_clients),
+                return_exceptions=True
+            )
     
     async def send_personal(self, websocket: WebSocket, message: dict):
         """Send a message to a specific WebSocket connection."""
         if "timestamp" not in message:
-            message["timestamp"] = datetime.utcnow().isoformat()
+            message["timestamp"] = datetime.now(timezone.utc).isoformat()
         
-        message_str = json.dumps(message, default=str)
+        message_str = _dumps(message)
         try:
             await websocket.send_text(message_str)
         except Exception as e:
@@ -71,7 +161,7 @@ class WebSocketManager:
     
     def get_connection_count(self, stream_id: str) -> int:
         """Get the number of active connections for a stream."""
-        return len(self.active_connections.get(stream_id, set()))
+        return len(self.active_connections.get(stream_id, {}))
     
     def get_all_stream_ids(self) -> list:
         """Get all stream IDs with active connections."""